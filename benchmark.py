@@ -0,0 +1,508 @@
+"""
+Mesures de performance, sur des données synthétiques reproductibles
+(voir donnees_synthetiques.py) et un faux serveur Ollama (faux_ollama.py).
+Les résultats sont écrits en JSON pour comparer deux exécutions.
+
+Usage :
+    python benchmark.py [--consultations 50] [--contributions 200] [--graine 42]
+        [--scenario NOM ...] [--sortie resultats.json]
+        [--comparer reference.json] [--seuil 0.2]
+
+Conventions des mesures : suffixe _ms ou _s (plus petit = meilleur),
+_par_s (plus grand = meilleur) ; les autres valeurs sont descriptives.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import database
+from donnees_synthetiques import generer_contributions, remplir_base
+
+
+def _chrono(fonction, *args, **kwargs):
+    """Exécute fonction et renvoie (résultat, durée en secondes)."""
+    debut = time.perf_counter()
+    resultat = fonction(*args, **kwargs)
+    return resultat, time.perf_counter() - debut
+
+
+# Comptage d'origine, avant les compteurs tenus par trigger : les mesures
+# « ancien contre nouveau » le gardent pour ne comparer qu'une chose à la fois
+SQL_COUNT = "SELECT COUNT(*) FROM contributions WHERE consultation_id = ?"
+
+
+def _count_par_connexion(consultation_id):
+    """Ancienne implémentation : une connexion ouverte et fermée par appel."""
+    conn = sqlite3.connect(database.DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(SQL_COUNT, (consultation_id,))
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+
+def _count_persistant(consultation_id):
+    """Même COUNT(*), sur la connexion persistante du thread."""
+    with database.transaction() as cursor:
+        cursor.execute(SQL_COUNT, (consultation_id,))
+        return cursor.fetchone()[0]
+
+
+def _appels_par_seconde(fonction, nb_appels, ids):
+    debut = time.perf_counter()
+    for i in range(nb_appels):
+        fonction(ids[i % len(ids)])
+    return nb_appels / (time.perf_counter() - debut)
+
+
+def _tableau_de_bord_n_plus_un():
+    """Ancien chargement du tableau de bord : 1 + 2N requêtes, COUNT(*) compris."""
+    cartes = []
+    for cid, nom in database.get_consultations():
+        description = database.get_consultation_details(cid)[1]
+        cartes.append((cid, nom, description[:120], _count_persistant(cid)))
+    return cartes
+
+
+def _requete_agregee_count():
+    """Requête agrégée d'avant les compteurs : aperçu et COUNT(*) calculés."""
+    with database.transaction() as cursor:
+        cursor.execute("""
+            SELECT c.id,
+                   c.nom,
+                   CASE WHEN length(c.description) > 120
+                        THEN substr(c.description, 1, 120) || '...'
+                        ELSE c.description
+                   END,
+                   COUNT(ct.id)
+            FROM consultations c
+            LEFT JOIN contributions ct ON ct.consultation_id = c.id
+            GROUP BY c.id
+            ORDER BY c.id
+        """)
+        return cursor.fetchall()
+
+
+def _premiere_page():
+    """Chemin d'afficher_consultations : total puis première page de la liste."""
+    database.count_consultations()
+    return database.get_consultations_page(0, 50)
+
+
+def _liste_complete():
+    """Défilement jusqu'en bas de la liste : toutes les pages, par clé."""
+    lignes = []
+    page = database.get_consultations_page(0, 50)
+    while page:
+        lignes.extend(page)
+        page = database.get_consultations_page(page[-1][0], 50) if len(page) == 50 else []
+    return lignes
+
+
+def _moyenne_ms(fonction, repetitions):
+    _, duree = _chrono(lambda: [fonction() for _ in range(repetitions)])
+    return duree / repetitions * 1000
+
+
+# Scénarios : chacun reçoit le contexte d'exécution et renvoie ses mesures
+
+def scenario_init_db(ctx):
+    """Création du schéma sur une base vide, puis réouverture d'une base existante."""
+    database.DB_NAME = os.path.join(ctx["dossier"], "init.db")
+    _, creation = _chrono(database.init_db)
+    _, reouverture = _chrono(database.init_db)
+    database.fermer_connexion()
+    return {"creation_ms": creation * 1000, "reouverture_ms": reouverture * 1000}
+
+
+def scenario_insertion_unitaire(ctx, nb=500):
+    """Contributions enregistrées une à une (formulaire de contribution)."""
+    database.DB_NAME = os.path.join(ctx["dossier"], "init.db")
+    database.init_db()
+    consultation_id = database.enregistrer_consultation("Unitaire", "Insertions une à une")
+    textes = list(generer_contributions(random.Random(ctx["graine"]), nb))
+    _, duree = _chrono(lambda: [database.enregistrer_contribution(consultation_id, t) for t in textes])
+    database.fermer_connexion()
+    return {"insertions": nb, "par_insertion_ms": duree / nb * 1000, "insertions_par_s": nb / duree}
+
+
+def scenario_insertion_lot(ctx):
+    """Remplissage de la base de mesure : N consultations × M contributions par lots."""
+    database.DB_NAME = os.path.join(ctx["dossier"], "bench.db")
+    database.init_db()
+    ctx["ids"], duree = _chrono(remplir_base, ctx["consultations"], ctx["contributions"], ctx["graine"])
+    lignes = ctx["consultations"] * ctx["contributions"]
+    return {
+        "lignes": lignes,
+        "duree_s": duree,
+        "lignes_par_s": lignes / duree,
+        "taille_base_mo": sum(
+            os.path.getsize(chemin) for chemin in (database.DB_NAME, database.DB_NAME + "-wal")
+            if os.path.exists(chemin)
+        ) / 1e6,
+    }
+
+
+def scenario_connexions(ctx):
+    """
+    Connexion ouverte à chaque appel contre connexion persistante par thread
+    (même COUNT(*)), puis, à part, le compteur tenu par trigger.
+    """
+    ancien = _appels_par_seconde(_count_par_connexion, ctx["appels"], ctx["ids"])
+    nouveau = _appels_par_seconde(_count_persistant, ctx["appels"], ctx["ids"])
+    compteur = _appels_par_seconde(database.count_contributions, ctx["appels"], ctx["ids"])
+    return {
+        "par_connexion_appels_par_s": ancien,
+        "persistante_appels_par_s": nouveau,
+        "compteur_appels_par_s": compteur,
+    }
+
+
+def scenario_tableau_de_bord(ctx, repetitions=20):
+    """Chargement de la liste des consultations (afficher_consultations)."""
+    return {
+        "premiere_page_ms": _moyenne_ms(_premiere_page, repetitions),
+        "liste_complete_ms": _moyenne_ms(_liste_complete, repetitions),
+        "requete_agregee_ms": _moyenne_ms(database.get_consultations_resume, repetitions),
+        "requete_agregee_count_ms": _moyenne_ms(_requete_agregee_count, repetitions),
+        "n_plus_un_ms": _moyenne_ms(_tableau_de_bord_n_plus_un, max(1, repetitions // 4)),
+    }
+
+
+def scenario_construction_prompt(ctx):
+    """
+    Préparation d'une synthèse (lancer_synthese) sur la première consultation :
+    parcours des contributions, dédoublonnage, budget, puis texte du prompt.
+    """
+    import synthese
+
+    consultation_id = ctx["ids"][0]
+    plan, preparation = _chrono(
+        synthese.preparer_synthese, consultation_id, synthese.DEFAULT_MODEL,
+        incremental=False, verifier_ollama=False
+    )
+
+    def construire():
+        if plan["lots"]:
+            return [synthese.formater_contributions(synthese.charger_contributions(lot), debut)
+                    for debut, lot in plan["lots"]]
+        return [synthese.formater_contributions(synthese.charger_contributions(plan["representants"]))]
+
+    prompts, construction = _chrono(construire)
+    return {
+        "preparation_ms": preparation * 1000,
+        "construction_ms": construction * 1000,
+        "tokens_prompt": plan["tokens_prompt"],
+        "representants": len(plan["representants"]),
+        "lots": len(plan["lots"] or []),
+        "caracteres": sum(len(p) for p in prompts),
+    }
+
+
+def scenario_synthese(ctx, nb_consultations=3, nb_nouvelles=10):
+    """
+    Synthèse de bout en bout contre le faux serveur : complète, depuis le
+    cache, puis incrémentale après l'ajout de contributions ; premier token
+    et débit d'un flux seul.
+    """
+    import synthese
+
+    ids = ctx["ids"][:nb_consultations]
+    model = synthese.DEFAULT_MODEL
+
+    def tout_synthetiser():
+        return [synthese.synthetiser_consultation(cid, model) for cid in ids]
+
+    resultats, complet = _chrono(tout_synthetiser)
+    _, cache = _chrono(tout_synthetiser)
+    hasard = random.Random(ctx["graine"] + 1)
+    database.enregistrer_contributions_lot([
+        (cid, texte) for cid in ids for texte in generer_contributions(hasard, nb_nouvelles)
+    ])
+    origines, delta = _chrono(tout_synthetiser)
+
+    premier = []
+    debut = time.perf_counter()
+    texte = synthese.streamer_prompt(
+        "Bonjour", model, lambda _: premier or premier.append(time.perf_counter() - debut)
+    )
+    flux = time.perf_counter() - debut
+    nb_tokens = len(texte.split())
+
+    return {
+        "consultations": len(ids),
+        "complete_s": complet / len(ids),
+        "cache_ms": cache / len(ids) * 1000,
+        "incrementale_s": delta / len(ids),
+        "origines": sorted({origine for _, origine in resultats + origines}),
+        "premier_token_ms": premier[0] * 1000 if premier else None,
+        "flux_tokens_par_s": nb_tokens / flux if flux else None,
+    }
+
+
+DOSSIER_APPLICATION = os.path.dirname(os.path.abspath(__file__))
+
+# Mesure de la première image dans un processus neuf (sortie : secondes)
+_PREMIERE_IMAGE = """
+import time
+debut = time.perf_counter()
+import main
+app = main.Application()
+app.root.update()
+print(time.perf_counter() - debut)
+app.root.destroy()
+"""
+
+
+def _importtime(module):
+    """
+    Importe module dans un processus neuf avec python -X importtime.
+    Renvoie (durée cumulée en secondes, modules chargés).
+    """
+    sortie = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=DOSSIER_APPLICATION, capture_output=True, text=True, check=True
+    ).stderr
+    cumuls = {}
+    for ligne in sortie.splitlines():
+        if ligne.startswith("import time:") and "|" in ligne:
+            _, cumul, nom = ligne[len("import time:"):].split("|")
+            if cumul.strip().isdigit():
+                cumuls[nom.strip()] = int(cumul) / 1e6
+    return cumuls.get(module, 0.0), set(cumuls)
+
+
+def scenario_demarrage(ctx, repetitions=5):
+    """
+    Démarrage à froid de l'interface : imports de main (python -X importtime,
+    meilleur de plusieurs processus) et, si un affichage est disponible,
+    délai jusqu'à la première image de la fenêtre principale.
+    """
+    imports = [_importtime("main") for _ in range(repetitions)]
+    modules = imports[0][1]
+    mesures = {
+        "import_main_ms": min(duree for duree, _ in imports) * 1000,
+        "modules_importes": len(modules),
+        "requests_importe": "requests" in modules,
+        "synthese_importe": "synthese" in modules,
+    }
+
+    # Base d'essai déjà au schéma courant, comme au lancement habituel
+    environnement = dict(os.environ, PYTHONPATH=DOSSIER_APPLICATION)
+    durees = []
+    for _ in range(repetitions):
+        resultat = subprocess.run(
+            [sys.executable, "-c", _PREMIERE_IMAGE], cwd=ctx["dossier"], env=environnement,
+            capture_output=True, text=True
+        )
+        if resultat.returncode != 0:
+            break  # pas d'affichage disponible
+        durees.append(float(resultat.stdout.split()[-1]))
+    if durees:
+        mesures["premiere_image_ms"] = min(durees) * 1000
+    return mesures
+
+
+def _mesurer_rendu(root, text_widget, pousser, nb_tokens, battement_ms=10):
+    """
+    Simule un modèle rapide qui pousse nb_tokens depuis un thread, et mesure
+    la latence de la boucle Tk (retard d'un battement périodique) ainsi que
+    le débit de tokens affichés.
+    """
+    import threading
+
+    retards = []
+    attendu = [time.perf_counter() + battement_ms / 1000]
+    fini = threading.Event()
+    debut = time.perf_counter()
+
+    def battement():
+        maintenant = time.perf_counter()
+        retards.append(max(0.0, maintenant - attendu[0]))
+        attendu[0] = maintenant + battement_ms / 1000
+        if fini.is_set() and text_widget.get("1.0", "end-1c").count("x") >= nb_tokens:
+            root.quit()
+        else:
+            root.after(battement_ms, battement)
+
+    def producteur():
+        for _ in range(nb_tokens):
+            pousser("x ")
+        fini.set()
+
+    root.after(battement_ms, battement)
+    threading.Thread(target=producteur, daemon=True).start()
+    root.mainloop()
+    duree = time.perf_counter() - debut
+    return nb_tokens / duree, sum(retards) / len(retards), max(retards)
+
+
+def scenario_rendu(ctx, nb_tokens=3000):
+    """Un win.after par token contre le rendu tamponné de la fenêtre de synthèse."""
+    import tkinter as tk
+    from fenetre_synthese import RenduTamponne
+
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None  # pas d'affichage disponible
+    root.withdraw()
+
+    def par_token(texte):
+        def append_text(t=texte):
+            text_widget.config(state="normal")
+            text_widget.insert("end", t)
+            text_widget.see("end")
+            text_widget.config(state="disabled")
+        root.after(0, append_text)
+
+    text_widget = tk.Text(root)
+    ancien = _mesurer_rendu(root, text_widget, par_token, nb_tokens)
+
+    text_widget = tk.Text(root)
+    rendu = RenduTamponne(text_widget)
+    rendu.demarrer()
+    nouveau = _mesurer_rendu(root, text_widget, rendu.ajouter, nb_tokens)
+    rendu.arreter()
+    root.destroy()
+
+    mesures = {}
+    for nom, (debit, moyenne, pire) in (("par_token", ancien), ("tamponne", nouveau)):
+        mesures[f"{nom}_tokens_par_s"] = debit
+        mesures[f"{nom}_latence_moy_ms"] = moyenne * 1000
+        mesures[f"{nom}_latence_max_ms"] = pire * 1000
+    return mesures
+
+
+SCENARIOS = {
+    "init_db": scenario_init_db,
+    "insertion_unitaire": scenario_insertion_unitaire,
+    "insertion_lot": scenario_insertion_lot,
+    "connexions": scenario_connexions,
+    "tableau_de_bord": scenario_tableau_de_bord,
+    "construction_prompt": scenario_construction_prompt,
+    "synthese": scenario_synthese,
+    "rendu": scenario_rendu,
+    "demarrage": scenario_demarrage,
+}
+# Scénarios qui lisent la base remplie par insertion_lot
+A_BASE_REMPLIE = {"connexions", "tableau_de_bord", "construction_prompt", "synthese"}
+
+
+def executer(args):
+    """Exécute les scénarios demandés et renvoie le rapport (dictionnaire JSON)."""
+    from faux_ollama import FauxOllama
+    import synthese
+
+    noms = args.scenario or list(SCENARIOS)
+    if A_BASE_REMPLIE & set(noms) and "insertion_lot" not in noms:
+        noms.insert(0, "insertion_lot")
+    noms = [nom for nom in SCENARIOS if nom in noms]
+
+    rapport = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "plateforme": platform.platform(),
+        "parametres": {
+            "consultations": args.consultations, "contributions": args.contributions,
+            "graine": args.graine, "appels": args.appels,
+            "ttft": args.ttft, "tokens_par_seconde": args.tokens_par_seconde,
+        },
+        "scenarios": {},
+    }
+
+    with tempfile.TemporaryDirectory() as dossier, FauxOllama(
+        ttft=args.ttft, tokens_par_seconde=args.tokens_par_seconde, graine=args.graine
+    ) as serveur:
+        synthese.client = synthese.ClientOllama(serveur.url)
+        ctx = {"dossier": dossier, "consultations": args.consultations,
+               "contributions": args.contributions, "graine": args.graine,
+               "appels": args.appels, "ids": []}
+        for nom in noms:
+            print(f"{nom} ...", file=sys.stderr, flush=True)
+            if nom in A_BASE_REMPLIE:
+                database.DB_NAME = os.path.join(dossier, "bench.db")
+            mesures = SCENARIOS[nom](ctx)
+            rapport["scenarios"][nom] = mesures
+            for cle, valeur in (mesures or {"ignoré": "pas d'affichage"}).items():
+                if isinstance(valeur, float):
+                    valeur = f"{valeur:.2f}"
+                print(f"  {cle:<28} {valeur}", file=sys.stderr)
+        database.fermer_connexion()
+    return rapport
+
+
+def comparer(rapport, reference, seuil):
+    """
+    Compare deux rapports mesure par mesure. Renvoie la liste des
+    régressions de plus de seuil (fraction) sur les mesures orientées.
+    """
+    regressions = []
+    for nom, mesures in rapport["scenarios"].items():
+        anciennes = reference.get("scenarios", {}).get(nom) or {}
+        for cle, valeur in (mesures or {}).items():
+            ancienne = anciennes.get(cle)
+            if not isinstance(valeur, (int, float)) or not isinstance(ancienne, (int, float)) or not ancienne:
+                continue
+            ratio = valeur / ancienne
+            if cle.endswith("_par_s"):
+                pire = ratio < 1 - seuil
+            elif cle.endswith(("_ms", "_s")):
+                pire = ratio > 1 + seuil
+            else:
+                continue
+            marque = "  RÉGRESSION" if pire else ""
+            print(f"{nom}.{cle:<28} {ancienne:12.2f} -> {valeur:12.2f}  x{ratio:.2f}{marque}")
+            if pire:
+                regressions.append(f"{nom}.{cle}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesures de performance reproductibles.")
+    parser.add_argument("--consultations", type=int, default=50)
+    parser.add_argument("--contributions", type=int, default=200,
+                        help="contributions par consultation (défaut : 200)")
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--appels", type=int, default=2000,
+                        help="appels du scénario connexions (défaut : 2000)")
+    parser.add_argument("--ttft", type=float, default=0.02,
+                        help="premier token du faux serveur, en secondes (défaut : 0.02)")
+    parser.add_argument("--tokens-par-seconde", type=float, default=2000.0,
+                        help="débit du faux serveur (défaut : 2000)")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS),
+                        help="scénario à exécuter, répétable (défaut : tous)")
+    parser.add_argument("--sortie", help="fichier JSON des résultats")
+    parser.add_argument("--comparer", metavar="REFERENCE",
+                        help="rapport JSON de référence à comparer")
+    parser.add_argument("--seuil", type=float, default=0.2,
+                        help="écart signalé comme régression (défaut : 0.2 = 20 %%)")
+    args = parser.parse_args(argv)
+
+    rapport = executer(args)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            json.dump(rapport, f, ensure_ascii=False, indent=2)
+        print(f"Résultats écrits dans {args.sortie}", file=sys.stderr)
+
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as f:
+            regressions = comparer(rapport, json.load(f), args.seuil)
+        if regressions:
+            print(f"{len(regressions)} régression(s) : {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
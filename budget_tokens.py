@@ -0,0 +1,67 @@
+"""
+Estimation du nombre de tokens des prompts, par modèle, et dimensionnement
+du contexte (num_ctx) des requêtes Ollama.
+Le rapport caractères/token dépend du tokenizer de chaque modèle : il est
+recalé après chaque génération d'après le prompt_eval_count renvoyé par Ollama.
+"""
+
+import threading
+
+CARACTERES_PAR_TOKEN = 3.5  # avant toute mesure (le français est plus dense que l'anglais)
+RATIO_MIN = 1.5             # mesures hors de ces bornes ignorées
+RATIO_MAX = 8.0             # (prompt tronqué ou déjà en cache côté Ollama)
+POIDS_MESURE = 0.3          # lissage exponentiel des mesures successives
+
+CONTEXTE_MIN = 2048         # num_ctx par défaut d'Ollama
+CONTEXTE_INCONNU = 4096     # modèle dont Ollama n'indique pas la longueur de contexte
+CONTEXTE_PLAFOND = 8192     # au-delà, le cache KV coûte trop de mémoire
+MARGE = 1.1                 # erreur d'estimation tolérée
+
+
+class EstimateurTokens:
+    """Estimation des tokens d'un texte, calibrée séparément pour chaque modèle."""
+
+    def __init__(self, caracteres_par_token=CARACTERES_PAR_TOKEN):
+        self.defaut = caracteres_par_token
+        self._ratios = {}
+        self._verrou = threading.Lock()
+
+    def caracteres_par_token(self, model=None):
+        with self._verrou:
+            return self._ratios.get(model, self.defaut)
+
+    def estimer(self, texte, model=None):
+        """Tokens estimés d'un texte (ou d'une longueur en caractères)."""
+        longueur = texte if isinstance(texte, int) else len(texte)
+        return int(longueur / self.caracteres_par_token(model)) + 1
+
+    def mesurer(self, model, nb_caracteres, nb_tokens):
+        """Recale l'estimation d'un modèle sur un prompt dont on connaît la taille réelle."""
+        if not nb_tokens:
+            return
+        ratio = nb_caracteres / nb_tokens
+        if not RATIO_MIN <= ratio <= RATIO_MAX:
+            return
+        with self._verrou:
+            ancien = self._ratios.get(model)
+            self._ratios[model] = ratio if ancien is None else ancien + POIDS_MESURE * (ratio - ancien)
+
+
+def dimensionner_contexte(tokens_prompt, num_predict, contexte_max):
+    """
+    num_ctx à demander pour un prompt : la plus petite puissance de deux
+    (au moins CONTEXTE_MIN) couvrant prompt et réponse avec MARGE, bornée
+    par contexte_max. Peu de valeurs distinctes : Ollama recharge le modèle
+    à chaque changement de num_ctx.
+    Renvoie (num_ctx, tient) ; tient est faux si le modèle devra tronquer.
+    """
+    besoin = int((tokens_prompt + num_predict) * MARGE)
+    num_ctx = CONTEXTE_MIN
+    while num_ctx < besoin:
+        num_ctx *= 2
+    return min(num_ctx, contexte_max), besoin <= contexte_max
+
+
+def budget_contenu(contexte_max, num_predict, tokens_gabarit):
+    """Tokens disponibles pour le contenu d'un prompt dans contexte_max."""
+    return max(int(contexte_max / MARGE) - num_predict - tokens_gabarit, 0)
@@ -7,6 +7,7 @@ import tkinter as tk
 from tkinter import messagebox
 import ttkbootstrap as ttk
 from database import enregistrer_consultation
+from ecriture_differee import ecrivain
 
 # Configuration des styles
 FONT_TITLE = ("Segoe UI", 22, "bold")
@@ -17,6 +18,7 @@ FONT_INPUT = ("Segoe UI", 11)
 def creer_formulaire(root, callback=None):
     """
     Ouvre le formulaire de création de consultation.
+    Le callback reçoit l'id de la consultation créée.
     """
     form_win = ttk.Toplevel(root)
     form_win.title("Nouvelle consultation")
@@ -99,6 +101,9 @@ def creer_formulaire(root, callback=None):
     
     # Fonction de validation
     def valider():
+        if str(btn_creer.cget("state")) == "disabled":
+            return  # enregistrement déjà en cours (touche Entrée)
+        
         nom = entry_nom.get().strip()
         desc = text_zone.get("1.0", "end").strip()
         
@@ -118,21 +123,44 @@ def creer_formulaire(root, callback=None):
             text_zone.focus_set()
             return
         
-        enregistrer_consultation(nom, desc)
-        form_win.destroy()
+        # Enregistrement par le thread d'écriture : l'interface reste réactive
+        btn_creer.config(state="disabled", text="Enregistrement...")
+        
+        def terminer(consultation_id, erreur):
+            if erreur is not None:
+                if form_win.winfo_exists():
+                    btn_creer.config(state="normal", text="Créer la consultation")
+                messagebox.showerror(
+                    "Erreur",
+                    f"La consultation n'a pas pu être créée :\n{erreur}"
+                )
+                return
+            
+            if form_win.winfo_exists():
+                form_win.destroy()
+            
+            # Appeler le callback pour ajouter la nouvelle carte
+            if callback:
+                callback(consultation_id)
+        
+        def on_fin(consultation_id, erreur):
+            # Thread d'écriture, après le COMMIT
+            try:
+                root.after(0, terminer, consultation_id, erreur)
+            except (tk.TclError, RuntimeError):
+                pass  # application fermée entre-temps
         
-        # Appeler le callback pour rafraîchir la liste
-        if callback:
-            callback()
+        ecrivain.soumettre(enregistrer_consultation, nom, desc, on_fin=on_fin)
     
     # Bouton de validation
-    ttk.Button(
+    btn_creer = ttk.Button(
         main_frame,
         text="Créer la consultation",
         bootstyle="dark",
         command=valider,
         padding=(25, 12)
-    ).pack(anchor="e", pady=(10, 0))
+    )
+    btn_creer.pack(anchor="e", pady=(10, 0))
     
     # Bind Enter pour valider
     form_win.bind("<Return>", lambda e: valider())
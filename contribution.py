@@ -7,6 +7,8 @@ import tkinter as tk
 from tkinter import messagebox
 import ttkbootstrap as ttk
 from database import enregistrer_contribution
+from ecriture_differee import ecrivain
+from validation import erreur_contribution
 
 # Configuration des styles
 FONT_TITLE = ("Segoe UI", 20, "bold")
@@ -96,39 +98,53 @@ def creer_contribution(root, consultation_id, consultation_nom, callback=None):
     def valider():
         texte = text_zone.get("1.0", "end").strip()
         
-        if not texte:
-            messagebox.showwarning(
-                "Contribution vide",
-                "Veuillez rédiger votre contribution."
-            )
+        erreur = erreur_contribution(texte)
+        if erreur:
+            messagebox.showwarning(*erreur)
             text_zone.focus_set()
             return
         
-        if len(texte) < 10:
-            messagebox.showwarning(
-                "Contribution trop courte",
-                "Votre contribution doit contenir au moins 10 caractères."
-            )
-            text_zone.focus_set()
-            return
+        # Enregistrement par le thread d'écriture : l'interface reste réactive
+        # (disque lent, base verrouillée par un autre écrivain)
+        btn_envoyer.config(state="disabled", text="Enregistrement...")
         
-        enregistrer_contribution(consultation_id, texte)
-        win.destroy()
+        def terminer(erreur):
+            if erreur is not None:
+                if win.winfo_exists():
+                    btn_envoyer.config(state="normal", text="Envoyer ma contribution")
+                messagebox.showerror(
+                    "Erreur",
+                    f"Votre contribution n'a pas pu être enregistrée :\n{erreur}"
+                )
+                return
+            
+            if win.winfo_exists():
+                win.destroy()
+            
+            messagebox.showinfo(
+                "Merci",
+                "Votre contribution a été enregistrée."
+            )
+            
+            # Appeler le callback pour rafraîchir
+            if callback:
+                callback()
         
-        messagebox.showinfo(
-            "Merci",
-            "Votre contribution a été enregistrée."
-        )
+        def on_fin(_, erreur):
+            # Thread d'écriture, après le COMMIT
+            try:
+                root.after(0, terminer, erreur)
+            except (tk.TclError, RuntimeError):
+                pass  # application fermée entre-temps
         
-        # Appeler le callback pour rafraîchir
-        if callback:
-            callback()
+        ecrivain.soumettre(enregistrer_contribution, consultation_id, texte, on_fin=on_fin)
     
     # Bouton d'envoi
-    ttk.Button(
+    btn_envoyer = ttk.Button(
         main_frame,
         text="Envoyer ma contribution",
         bootstyle="dark",
         command=valider,
         padding=(25, 12)
-    ).pack(anchor="e", pady=(10, 0))
+    )
+    btn_envoyer.pack(anchor="e", pady=(10, 0))
@@ -1,98 +1,753 @@
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from doublons import signature_minhash
+from instrumentation import instrumente
 
 DB_NAME = "consultations.db"
 
+# Réglages appliqués à chaque nouvelle connexion
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -20000),      # ~20 Mo de cache de pages
+    ("mmap_size", 268435456),    # 256 Mo lus par mmap
+    ("temp_store", "MEMORY"),
+)
+
+# Recherche plein texte : insensible à la casse et aux accents
+TOKENIZER_FTS = "unicode61 remove_diacritics 2"
+
+# Marqueurs entourant les termes trouvés dans les extraits de recherche
+DEBUT_SURLIGNAGE = "\x02"
+FIN_SURLIGNAGE = "\x03"
+
+# Au-delà de ce nombre de résultats, seuls les plus récents sont classés par
+# bm25 : un terme très fréquent reste interactif sur des millions de lignes
+FENETRE_RECHERCHE = 2000
+
+# Contributions lues par page par iter_contributions
+TAILLE_PAGE_CONTRIBUTIONS = 500
+
+# Version du schéma créé par init_db : à incrémenter à chaque modification
+VERSION_SCHEMA = 2
+
+# Longueur de l'aperçu de description stocké pour les cartes du tableau de bord
+LONGUEUR_APERCU = 120
+
+# Une connexion longue durée par thread
+_local = threading.local()
+
+
+def _ouvrir_connexion(db_name):
+    """Ouvre une connexion et applique les réglages de performance."""
+    conn = sqlite3.connect(db_name, isolation_level=None, timeout=10)
+    for pragma, valeur in PRAGMAS:
+        conn.execute(f"PRAGMA {pragma} = {valeur}")
+    return conn
+
+
+def get_connexion():
+    """Renvoie la connexion du thread courant, en l'ouvrant au besoin."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.db_name != DB_NAME:
+        if conn is not None:
+            conn.close()
+        conn = _ouvrir_connexion(DB_NAME)
+        _local.conn = conn
+        _local.db_name = DB_NAME
+        _local.profondeur = 0
+    return conn
+
+
+def fermer_connexion():
+    """Ferme la connexion du thread courant (à appeler en fin de thread)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
 
+
+@contextmanager
+def transaction(ecriture=False):
+    """
+    Ouvre une transaction sur la connexion du thread et fournit un curseur.
+    Valide en sortie, annule en cas d'exception. Les transactions imbriquées
+    rejoignent la transaction englobante.
+    """
+    conn = get_connexion()
+    if _local.profondeur:
+        _local.profondeur += 1
+        try:
+            yield conn.cursor()
+        finally:
+            _local.profondeur -= 1
+        return
+
+    conn.execute("BEGIN IMMEDIATE" if ecriture else "BEGIN")
+    _local.profondeur = 1
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+    finally:
+        _local.profondeur = 0
+
+
+@instrumente
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    """
+    Crée ou met à jour le schéma. Sa version est notée dans PRAGMA
+    user_version : au démarrage, une base déjà à jour ne coûte qu'une lecture.
+    """
+    if get_connexion().execute("PRAGMA user_version").fetchone()[0] >= VERSION_SCHEMA:
+        return
+    with transaction(ecriture=True) as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS consultations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nom TEXT NOT NULL,
+                description TEXT NOT NULL,
+                nb_contributions INTEGER NOT NULL DEFAULT 0,
+                apercu TEXT NOT NULL DEFAULT '',
+                derniere_activite REAL
+            )
+        """)
 
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS consultations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            description TEXT NOT NULL
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS contributions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                consultation_id INTEGER NOT NULL,
+                texte TEXT NOT NULL,
+                FOREIGN KEY(consultation_id) REFERENCES consultations(id)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_contributions_consultation
+            ON contributions(consultation_id)
+        """)
+
+        # Cache des synthèses générées (clé = empreinte des entrées)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS syntheses (
+                cle TEXT PRIMARY KEY,
+                consultation_id INTEGER NOT NULL,
+                modele TEXT NOT NULL,
+                texte TEXT NOT NULL,
+                taille INTEGER NOT NULL,
+                cree_le REAL NOT NULL,
+                utilise_le REAL NOT NULL,
+                FOREIGN KEY(consultation_id) REFERENCES consultations(id)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_syntheses_utilise_le
+            ON syntheses(utilise_le)
+        """)
+
+        # Dernière synthèse par consultation et modèle, pour les mises à jour
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS syntheses_incrementales (
+                consultation_id INTEGER NOT NULL,
+                modele TEXT NOT NULL,
+                texte TEXT NOT NULL,
+                dernier_contribution_id INTEGER NOT NULL,
+                mis_a_jour_le REAL NOT NULL,
+                PRIMARY KEY(consultation_id, modele),
+                FOREIGN KEY(consultation_id) REFERENCES consultations(id)
+            )
+        """)
+
+        # Signatures MinHash des contributions (détection des quasi-doublons)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS contributions_minhash (
+                contribution_id INTEGER PRIMARY KEY,
+                signature BLOB NOT NULL,
+                FOREIGN KEY(contribution_id) REFERENCES contributions(id)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS contributions_minhash_ad
+            AFTER DELETE ON contributions BEGIN
+                DELETE FROM contributions_minhash WHERE contribution_id = old.id;
+            END
+        """)
+
+        _init_cartes(cursor)
+        _init_recherche(cursor)
+        cursor.execute(f"PRAGMA user_version = {VERSION_SCHEMA}")
+
+
+def _expression_apercu(colonne, longueur):
+    """Expression SQL de l'aperçu : les `longueur` premiers caractères, puis '...'."""
+    longueur = int(longueur)
+    return (f"CASE WHEN length({colonne}) > {longueur} "
+            f"THEN substr({colonne}, 1, {longueur}) || '...' ELSE {colonne} END")
+
+
+# Horodatage Unix (comme time.time()) calculé par SQLite
+_MAINTENANT_SQL = "((julianday('now') - 2440587.5) * 86400.0)"
+
+
+def _init_cartes(cursor):
+    """
+    Colonnes dénormalisées des cartes du tableau de bord : nombre de
+    contributions, aperçu de la description et dernière activité, tenus à
+    jour par des triggers. Une base antérieure reçoit les colonnes puis un
+    calcul initial ; l'index couvrant permet de lister les cartes sans lire
+    les descriptions.
+    """
+    cursor.execute("PRAGMA table_info(consultations)")
+    colonnes = {row[1] for row in cursor.fetchall()}
+    a_remplir = "nb_contributions" not in colonnes
+    if a_remplir:
+        cursor.execute(
+            "ALTER TABLE consultations ADD COLUMN nb_contributions INTEGER NOT NULL DEFAULT 0"
         )
-    """)
+        cursor.execute("ALTER TABLE consultations ADD COLUMN apercu TEXT NOT NULL DEFAULT ''")
+        cursor.execute("ALTER TABLE consultations ADD COLUMN derniere_activite REAL")
+
+    apercu = _expression_apercu("new.description", LONGUEUR_APERCU)
+    triggers = (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS consultations_cartes_ai AFTER INSERT ON consultations BEGIN
+            UPDATE consultations SET apercu = {apercu}, derniere_activite = {_MAINTENANT_SQL}
+            WHERE id = new.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS consultations_cartes_au AFTER UPDATE OF description ON consultations BEGIN
+            UPDATE consultations SET apercu = {apercu} WHERE id = new.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS contributions_cartes_ai AFTER INSERT ON contributions BEGIN
+            UPDATE consultations
+            SET nb_contributions = nb_contributions + 1, derniere_activite = {_MAINTENANT_SQL}
+            WHERE id = new.consultation_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS contributions_cartes_ad AFTER DELETE ON contributions BEGIN
+            UPDATE consultations
+            SET nb_contributions = nb_contributions - 1, derniere_activite = {_MAINTENANT_SQL}
+            WHERE id = old.consultation_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS contributions_cartes_au AFTER UPDATE OF consultation_id ON contributions BEGIN
+            UPDATE consultations SET nb_contributions = nb_contributions - 1
+            WHERE id = old.consultation_id;
+            UPDATE consultations
+            SET nb_contributions = nb_contributions + 1, derniere_activite = {_MAINTENANT_SQL}
+            WHERE id = new.consultation_id;
+        END
+        """,
+    )
+    for trigger in triggers:
+        cursor.execute(trigger)
 
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS contributions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            consultation_id INTEGER NOT NULL,
-            texte TEXT NOT NULL,
-            FOREIGN KEY(consultation_id) REFERENCES consultations(id)
-        )
+        CREATE INDEX IF NOT EXISTS idx_consultations_cartes
+        ON consultations(id, nom, apercu, nb_contributions)
     """)
 
-    conn.commit()
-    conn.close()
+    # Base existante : calcul initial, une fois pour toutes
+    if a_remplir:
+        cursor.execute(f"""
+            UPDATE consultations SET
+                apercu = {_expression_apercu("description", LONGUEUR_APERCU)},
+                nb_contributions = (
+                    SELECT COUNT(*) FROM contributions ct WHERE ct.consultation_id = consultations.id
+                ),
+                derniere_activite = {_MAINTENANT_SQL}
+        """)
 
 
-def enregistrer_consultation(nom, description):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+def _init_recherche(cursor):
+    """
+    Index plein texte FTS5 (contenu externe) sur les consultations et les
+    contributions, tenus à jour par des triggers.
+    """
     cursor.execute(
-        "INSERT INTO consultations (nom, description) VALUES (?, ?)",
-        (nom, description)
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN "
+        "('consultations_fts', 'contributions_fts')"
     )
-    conn.commit()
-    conn.close()
+    existantes = {row[0] for row in cursor.fetchall()}
 
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS consultations_fts USING fts5(
+            nom, description,
+            content='consultations', content_rowid='id',
+            tokenize="{TOKENIZER_FTS}", prefix='2 3'
+        )
+    """)
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS contributions_fts USING fts5(
+            texte,
+            content='contributions', content_rowid='id',
+            tokenize="{TOKENIZER_FTS}", prefix='2 3'
+        )
+    """)
 
-def enregistrer_contribution(consultation_id, texte):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO contributions (consultation_id, texte) VALUES (?, ?)",
-        (consultation_id, texte)
+    triggers = (
+        """
+        CREATE TRIGGER IF NOT EXISTS consultations_fts_ai AFTER INSERT ON consultations BEGIN
+            INSERT INTO consultations_fts(rowid, nom, description)
+            VALUES (new.id, new.nom, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS consultations_fts_ad AFTER DELETE ON consultations BEGIN
+            INSERT INTO consultations_fts(consultations_fts, rowid, nom, description)
+            VALUES ('delete', old.id, old.nom, old.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS consultations_fts_au AFTER UPDATE OF nom, description ON consultations BEGIN
+            INSERT INTO consultations_fts(consultations_fts, rowid, nom, description)
+            VALUES ('delete', old.id, old.nom, old.description);
+            INSERT INTO consultations_fts(rowid, nom, description)
+            VALUES (new.id, new.nom, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS contributions_fts_ai AFTER INSERT ON contributions BEGIN
+            INSERT INTO contributions_fts(rowid, texte) VALUES (new.id, new.texte);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS contributions_fts_ad AFTER DELETE ON contributions BEGIN
+            INSERT INTO contributions_fts(contributions_fts, rowid, texte)
+            VALUES ('delete', old.id, old.texte);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS contributions_fts_au AFTER UPDATE OF texte ON contributions BEGIN
+            INSERT INTO contributions_fts(contributions_fts, rowid, texte)
+            VALUES ('delete', old.id, old.texte);
+            INSERT INTO contributions_fts(rowid, texte) VALUES (new.id, new.texte);
+        END
+        """,
     )
-    conn.commit()
-    conn.close()
+    for trigger in triggers:
+        cursor.execute(trigger)
+
+    # Base existante : indexer les lignes antérieures aux triggers
+    if "consultations_fts" not in existantes:
+        cursor.execute("INSERT INTO consultations_fts(consultations_fts) VALUES ('rebuild')")
+    if "contributions_fts" not in existantes:
+        cursor.execute("INSERT INTO contributions_fts(contributions_fts) VALUES ('rebuild')")
+
+
+@instrumente
+def enregistrer_consultation(nom, description):
+    with transaction(ecriture=True) as cursor:
+        cursor.execute(
+            "INSERT INTO consultations (nom, description) VALUES (?, ?)",
+            (nom, description)
+        )
+        return cursor.lastrowid
+
+
+@instrumente
+def enregistrer_contribution(consultation_id, texte):
+    # Calculée avant BEGIN IMMEDIATE : le verrou d'écriture n'attend pas le hachage
+    signature = signature_minhash(texte)
+    with transaction(ecriture=True) as cursor:
+        cursor.execute(
+            "INSERT INTO contributions (consultation_id, texte) VALUES (?, ?)",
+            (consultation_id, texte)
+        )
+        cursor.execute(
+            "INSERT INTO contributions_minhash (contribution_id, signature) VALUES (?, ?)",
+            (cursor.lastrowid, signature)
+        )
+
+
+@instrumente(lignes=int)
+def enregistrer_contributions_lot(lignes):
+    """
+    Insère un lot de contributions (consultation_id, texte) dans une seule
+    transaction, avec leurs signatures MinHash. Renvoie le nombre de lignes
+    insérées.
+    """
+    if not lignes:
+        return 0
+    # Signatures calculées hors transaction, pour ne pas tenir le verrou d'écriture
+    signatures = [signature_minhash(texte) for _, texte in lignes]
+    with transaction(ecriture=True) as cursor:
+        cursor.executemany(
+            "INSERT INTO contributions (consultation_id, texte) VALUES (?, ?)",
+            lignes
+        )
+        # Les ids d'un même executemany sont consécutifs (écrivain unique)
+        premier_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0] - len(lignes) + 1
+        cursor.executemany(
+            "INSERT INTO contributions_minhash (contribution_id, signature) VALUES (?, ?)",
+            [(premier_id + i, signature) for i, signature in enumerate(signatures)]
+        )
+        return len(lignes)
+
 
+@instrumente
+def get_consultation_ids():
+    """Renvoie l'ensemble des ids de consultations existantes."""
+    with transaction() as cursor:
+        cursor.execute("SELECT id FROM consultations")
+        return {row[0] for row in cursor}
 
+
+@instrumente
 def get_consultations():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, nom FROM consultations")
-    data = cursor.fetchall()
-    conn.close()
-    return data
+    with transaction() as cursor:
+        cursor.execute("SELECT id, nom FROM consultations")
+        return cursor.fetchall()
+
+
+def _colonnes_carte(longueur_apercu):
+    """
+    Colonnes d'une carte du tableau de bord : id, nom, aperçu, nb de
+    contributions. À la longueur stockée, tout vient des colonnes
+    dénormalisées (index couvrant) : ni description ni contributions lues.
+    """
+    if longueur_apercu == LONGUEUR_APERCU:
+        apercu = "c.apercu"
+    else:
+        apercu = _expression_apercu("c.description", longueur_apercu)
+    return f"c.id, c.nom, {apercu}, c.nb_contributions"
+
+
+def _index_cartes(longueur_apercu):
+    # Recherche par id : SQLite préférerait la table, et lirait la description
+    return "INDEXED BY idx_consultations_cartes" if longueur_apercu == LONGUEUR_APERCU else ""
+
+
+@instrumente
+def get_consultations_resume(longueur_apercu=LONGUEUR_APERCU):
+    """
+    Récupère en une seule requête ce qu'affiche le tableau de bord :
+    id, nom, aperçu de la description et nombre de contributions.
+    """
+    with transaction() as cursor:
+        cursor.execute(f"""
+            SELECT {_colonnes_carte(longueur_apercu)}
+            FROM consultations c
+            ORDER BY c.id
+        """)
+        return cursor.fetchall()
+
+
+@instrumente
+def get_consultations_page(apres_id=0, limite=50, longueur_apercu=LONGUEUR_APERCU):
+    """
+    Page suivante du tableau de bord (pagination par clé sur l'id) :
+    mêmes colonnes que get_consultations_resume, ids strictement > apres_id.
+    """
+    with transaction() as cursor:
+        cursor.execute(f"""
+            SELECT {_colonnes_carte(longueur_apercu)}
+            FROM consultations c
+            WHERE c.id > :apres
+            ORDER BY c.id
+            LIMIT :limite
+        """, {"apres": apres_id, "limite": limite})
+        return cursor.fetchall()
+
+
+@instrumente
+def get_consultation_id_au_rang(rang):
+    """
+    Id de la consultation de rang donné (0 = la première) dans l'ordre des
+    ids, None au-delà : la liste virtuelle reprend la pagination par clé à
+    la page visible. OFFSET ne parcourt que l'index couvrant des cartes.
+    """
+    with transaction() as cursor:
+        cursor.execute(
+            "SELECT id FROM consultations INDEXED BY idx_consultations_cartes ORDER BY id LIMIT 1 OFFSET ?",
+            (rang,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
 
 
+@instrumente
+def get_consultation_resume(consultation_id, longueur_apercu=LONGUEUR_APERCU):
+    """Ligne de tableau de bord d'une seule consultation (après une écriture)."""
+    with transaction() as cursor:
+        cursor.execute(f"""
+            SELECT {_colonnes_carte(longueur_apercu)}
+            FROM consultations c {_index_cartes(longueur_apercu)}
+            WHERE c.id = :id
+        """, {"id": consultation_id})
+        return cursor.fetchone()
+
+
+@instrumente
+def count_consultations():
+    """Compte le nombre total de consultations."""
+    with transaction() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM consultations")
+        return cursor.fetchone()[0]
+
+
+@instrumente
 def get_consultation_details(consultation_id):
     """Récupère les détails d'une consultation (nom et description)."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT nom, description FROM consultations WHERE id = ?",
-        (consultation_id,)
-    )
-    data = cursor.fetchone()
-    conn.close()
-    return data
+    with transaction() as cursor:
+        cursor.execute(
+            "SELECT nom, description FROM consultations WHERE id = ?",
+            (consultation_id,)
+        )
+        return cursor.fetchone()
 
 
-def get_contributions(consultation_id):
-    """Récupère toutes les contributions d'une consultation."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, texte FROM contributions WHERE consultation_id = ?",
-        (consultation_id,)
-    )
-    data = cursor.fetchall()
-    conn.close()
-    return data
+@instrumente
+def iter_contributions(consultation_id, apres_id=0, taille_page=TAILLE_PAGE_CONTRIBUTIONS):
+    """
+    Parcourt les contributions d'une consultation par id croissant, d'id
+    strictement > apres_id, sans les charger toutes : pagination par clé
+    (id > dernier id lu), une courte transaction par page. Produit des
+    (id, texte) ; au plus taille_page lignes sont en mémoire à la fois.
+    """
+    while True:
+        with transaction() as cursor:
+            cursor.execute(
+                """SELECT id, texte FROM contributions
+                   WHERE consultation_id = ? AND id > ?
+                   ORDER BY id
+                   LIMIT ?""",
+                (consultation_id, apres_id, taille_page)
+            )
+            page = cursor.fetchall()
+        yield from page
+        if len(page) < taille_page:
+            return
+        apres_id = page[-1][0]
 
 
+@instrumente
+def get_textes_contributions(contribution_ids):
+    """Textes d'une liste (courte) de contributions : dict id -> texte."""
+    contribution_ids = list(contribution_ids)
+    if not contribution_ids:
+        return {}
+    with transaction() as cursor:
+        cursor.execute(
+            f"SELECT id, texte FROM contributions WHERE id IN ({','.join('?' * len(contribution_ids))})",
+            contribution_ids
+        )
+        return dict(cursor.fetchall())
+
+
+@instrumente
 def count_contributions(consultation_id):
-    """Compte le nombre de contributions pour une consultation."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    """Nombre de contributions d'une consultation (compteur tenu par trigger)."""
+    with transaction() as cursor:
+        cursor.execute(
+            "SELECT nb_contributions FROM consultations INDEXED BY idx_consultations_cartes WHERE id = ?",
+            (consultation_id,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+
+@instrumente
+def get_synthese_cache(cle):
+    """Renvoie le texte d'une synthèse en cache (ou None) et note son usage."""
+    with transaction(ecriture=True) as cursor:
+        cursor.execute("SELECT texte FROM syntheses WHERE cle = ?", (cle,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute(
+            "UPDATE syntheses SET utilise_le = ? WHERE cle = ?",
+            (time.time(), cle)
+        )
+        return row[0]
+
+
+@instrumente
+def enregistrer_synthese_cache(cle, consultation_id, modele, texte):
+    """Enregistre (ou remplace) une synthèse dans le cache."""
+    maintenant = time.time()
+    with transaction(ecriture=True) as cursor:
+        cursor.execute(
+            """INSERT OR REPLACE INTO syntheses
+               (cle, consultation_id, modele, texte, taille, cree_le, utilise_le)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (cle, consultation_id, modele, texte, len(texte.encode("utf-8")),
+             maintenant, maintenant)
+        )
+
+
+@instrumente(lignes=int)
+def purger_syntheses(age_max=None, taille_max=None):
+    """
+    Évince les synthèses en cache plus anciennes que age_max (secondes),
+    puis les moins récemment utilisées jusqu'à repasser sous taille_max (octets).
+    Renvoie le nombre de synthèses supprimées.
+    """
+    supprimees = 0
+    with transaction(ecriture=True) as cursor:
+        if age_max is not None:
+            cursor.execute(
+                "DELETE FROM syntheses WHERE utilise_le < ?",
+                (time.time() - age_max,)
+            )
+            supprimees += cursor.rowcount
+
+        if taille_max is not None:
+            cursor.execute("SELECT COALESCE(SUM(taille), 0) FROM syntheses")
+            total = cursor.fetchone()[0]
+            if total > taille_max:
+                cursor.execute("SELECT cle, taille FROM syntheses ORDER BY utilise_le")
+                a_supprimer = []
+                for cle, taille in cursor.fetchall():
+                    if total <= taille_max:
+                        break
+                    a_supprimer.append((cle,))
+                    total -= taille
+                cursor.executemany("DELETE FROM syntheses WHERE cle = ?", a_supprimer)
+                supprimees += len(a_supprimer)
+    return supprimees
+
+
+@instrumente
+def get_derniere_synthese(consultation_id, modele):
+    """Renvoie (texte, dernier_contribution_id) de la dernière synthèse, ou None."""
+    with transaction() as cursor:
+        cursor.execute(
+            """SELECT texte, dernier_contribution_id FROM syntheses_incrementales
+               WHERE consultation_id = ? AND modele = ?""",
+            (consultation_id, modele)
+        )
+        return cursor.fetchone()
+
+
+@instrumente
+def enregistrer_derniere_synthese(consultation_id, modele, texte, dernier_contribution_id):
+    """Mémorise la dernière synthèse et la plus haute contribution couverte."""
+    with transaction(ecriture=True) as cursor:
+        cursor.execute(
+            """INSERT OR REPLACE INTO syntheses_incrementales
+               (consultation_id, modele, texte, dernier_contribution_id, mis_a_jour_le)
+               VALUES (?, ?, ?, ?, ?)""",
+            (consultation_id, modele, texte, dernier_contribution_id, time.time())
+        )
+
+
+def _requete_fts(texte):
+    """
+    Transforme une saisie libre en requête FTS5 : chaque mot est cité
+    (pas de syntaxe FTS involontaire), le dernier est recherché par préfixe.
+    """
+    mots = [mot.replace('"', '""') for mot in texte.split()]
+    if not mots:
+        return None
+    termes = [f'"{mot}"' for mot in mots]
+    if len(mots[-1]) >= 2:
+        termes[-1] += "*"
+    return " ".join(termes)
+
+
+def _borne_fenetre(cursor, table, requete):
+    """
+    Plus petit rowid parmi les FENETRE_RECHERCHE correspondances les plus
+    récentes (parcours par rowid décroissant, sans calcul de rang), ou 0
+    s'il y en a moins.
+    """
     cursor.execute(
-        "SELECT COUNT(*) FROM contributions WHERE consultation_id = ?",
-        (consultation_id,)
+        f"SELECT rowid FROM {table} WHERE {table} MATCH ? "
+        "ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+        (requete, FENETRE_RECHERCHE - 1)
     )
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+@instrumente
+def rechercher_consultations(texte, limite=20):
+    """
+    Recherche plein texte dans les consultations, classée par bm25
+    (le nom pèse plus que la description).
+    Renvoie (id, nom surligné, extrait surligné de la description).
+    """
+    requete = _requete_fts(texte)
+    if requete is None:
+        return []
+    with transaction() as cursor:
+        cursor.execute("""
+            SELECT f.rowid,
+                   highlight(consultations_fts, 0, :debut, :fin),
+                   snippet(consultations_fts, 1, :debut, :fin, '…', 16)
+            FROM consultations_fts f
+            WHERE consultations_fts MATCH :requete
+              AND rank MATCH 'bm25(10.0, 1.0)'
+              AND f.rowid >= :borne
+            ORDER BY rank
+            LIMIT :limite
+        """, {"requete": requete, "limite": limite,
+              "borne": _borne_fenetre(cursor, "consultations_fts", requete),
+              "debut": DEBUT_SURLIGNAGE, "fin": FIN_SURLIGNAGE})
+        return cursor.fetchall()
+
+
+@instrumente
+def rechercher_contributions(texte, limite=20):
+    """
+    Recherche plein texte dans les contributions, classée par bm25.
+    Renvoie (id, consultation_id, nom de la consultation, extrait surligné).
+    """
+    requete = _requete_fts(texte)
+    if requete is None:
+        return []
+    with transaction() as cursor:
+        cursor.execute("""
+            SELECT f.rowid,
+                   ct.consultation_id,
+                   c.nom,
+                   snippet(contributions_fts, 0, :debut, :fin, '…', 16)
+            FROM contributions_fts f
+            JOIN contributions ct ON ct.id = f.rowid
+            JOIN consultations c ON c.id = ct.consultation_id
+            WHERE contributions_fts MATCH :requete
+              AND f.rowid >= :borne
+            ORDER BY rank
+            LIMIT :limite
+        """, {"requete": requete, "limite": limite,
+              "borne": _borne_fenetre(cursor, "contributions_fts", requete),
+              "debut": DEBUT_SURLIGNAGE, "fin": FIN_SURLIGNAGE})
+        return cursor.fetchall()
+
+
+@instrumente
+def get_signatures(consultation_id):
+    """Signatures MinHash des contributions d'une consultation (id -> octets)."""
+    with transaction() as cursor:
+        cursor.execute(
+            """SELECT m.contribution_id, m.signature
+               FROM contributions_minhash m
+               JOIN contributions ct ON ct.id = m.contribution_id
+               WHERE ct.consultation_id = ?""",
+            (consultation_id,)
+        )
+        return dict(cursor.fetchall())
+
+
+@instrumente
+def enregistrer_signatures(signatures):
+    """Enregistre des signatures MinHash calculées après coup [(id, octets)]."""
+    with transaction(ecriture=True) as cursor:
+        cursor.executemany(
+            "INSERT OR REPLACE INTO contributions_minhash (contribution_id, signature) VALUES (?, ?)",
+            signatures
+        )
@@ -0,0 +1,135 @@
+"""
+Génération de données synthétiques reproductibles pour les mesures :
+N consultations × M contributions, textes en français de longueurs réalistes
+(la plupart de quelques phrases, une longue traîne de contributions
+détaillées) et une part de contributions « de campagne » quasi identiques.
+
+Usage :
+    python donnees_synthetiques.py base.db [--consultations 50]
+        [--contributions 200] [--graine 42]
+"""
+
+import argparse
+import math
+import random
+import sys
+
+import database
+
+# Longueur des contributions : loi log-normale (médiane ~280 caractères)
+LONGUEUR_MEDIANE = 280
+DISPERSION_LONGUEUR = 0.9
+LONGUEUR_MIN = 20
+LONGUEUR_MAX = 4000
+PART_CAMPAGNE = 0.05        # contributions reprenant un texte commun
+
+SUJETS = (
+    "les pistes cyclables", "le stationnement", "les transports en commun",
+    "la place du marché", "les espaces verts", "l'éclairage public",
+    "la cantine scolaire", "le budget participatif", "la rénovation de la mairie",
+    "les horaires de la médiathèque", "la circulation aux abords des écoles",
+    "le tri des déchets", "les aires de jeux", "la vitesse en centre-ville",
+)
+DEBUTS = (
+    "Je pense que", "Il faudrait que", "À mon avis,", "Nous souhaitons que",
+    "Il me semble important que", "Je propose que", "Les habitants du quartier demandent que",
+    "Je ne suis pas d'accord pour que", "Il serait utile que", "Depuis des années,",
+)
+VERBES = (
+    "soient améliorés", "soient repensés", "fassent l'objet d'une concertation",
+    "deviennent une priorité", "soient mieux entretenus", "restent tels quels",
+    "soient adaptés aux personnes âgées", "bénéficient d'un budget plus important",
+    "soient sécurisés", "soient étendus à tout le quartier",
+)
+COMPLEMENTS = (
+    "surtout le soir", "en particulier pour les enfants", "comme dans la commune voisine",
+    "sans augmenter les impôts", "avant l'été prochain", "pour limiter la pollution",
+    "afin que chacun puisse en profiter", "en concertation avec les commerçants",
+    "car la situation actuelle est dangereuse", "pour les familles comme pour les aînés",
+)
+
+
+def _phrase(hasard):
+    phrase = (f"{hasard.choice(DEBUTS)} {hasard.choice(SUJETS)} {hasard.choice(VERBES)}, "
+              f"{hasard.choice(COMPLEMENTS)}.")
+    return phrase[0].upper() + phrase[1:]
+
+
+def longueur_contribution(hasard):
+    """Longueur tirée selon la loi log-normale, bornée."""
+    longueur = int(hasard.lognormvariate(math.log(LONGUEUR_MEDIANE), DISPERSION_LONGUEUR))
+    return max(LONGUEUR_MIN, min(longueur, LONGUEUR_MAX))
+
+
+def generer_texte(hasard, longueur):
+    """Texte d'environ `longueur` caractères fait de phrases complètes."""
+    phrases = []
+    taille = 0
+    while taille < longueur:
+        phrase = _phrase(hasard)
+        phrases.append(phrase)
+        taille += len(phrase) + 1
+    return " ".join(phrases)[:max(longueur, LONGUEUR_MIN)].rstrip()
+
+
+def generer_contributions(hasard, nb_contributions):
+    """Produit nb_contributions textes, dont une part de textes de campagne."""
+    campagne = generer_texte(hasard, LONGUEUR_MEDIANE)
+    for _ in range(nb_contributions):
+        if hasard.random() < PART_CAMPAGNE:
+            # Texte commun, légèrement personnalisé
+            yield f"{campagne} {hasard.choice(COMPLEMENTS).capitalize()}."
+        else:
+            yield generer_texte(hasard, longueur_contribution(hasard))
+
+
+def generer_consultation(hasard, numero):
+    sujet = hasard.choice(SUJETS)
+    nom = f"Consultation {numero} : {sujet}"
+    description = (f"Que pensez-vous de {sujet} dans notre commune ? "
+                   + " ".join(_phrase(hasard) for _ in range(hasard.randint(1, 4))))
+    return nom, description
+
+
+def remplir_base(nb_consultations, nb_contributions, graine=42, taille_lot=1000):
+    """
+    Remplit la base courante (database.DB_NAME) : nb_consultations
+    consultations de nb_contributions contributions chacune, insérées par lots.
+    Renvoie la liste des ids de consultations créées.
+    """
+    hasard = random.Random(graine)
+    ids = []
+    for numero in range(1, nb_consultations + 1):
+        ids.append(database.enregistrer_consultation(*generer_consultation(hasard, numero)))
+
+    lot = []
+    for consultation_id in ids:
+        for texte in generer_contributions(hasard, nb_contributions):
+            lot.append((consultation_id, texte))
+            if len(lot) >= taille_lot:
+                database.enregistrer_contributions_lot(lot)
+                lot = []
+    if lot:
+        database.enregistrer_contributions_lot(lot)
+    return ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remplit une base avec des données synthétiques.")
+    parser.add_argument("base", help="fichier SQLite à remplir (créé au besoin)")
+    parser.add_argument("--consultations", type=int, default=50)
+    parser.add_argument("--contributions", type=int, default=200,
+                        help="contributions par consultation (défaut : 200)")
+    parser.add_argument("--graine", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    database.DB_NAME = args.base
+    database.init_db()
+    ids = remplir_base(args.consultations, args.contributions, args.graine)
+    print(f"{len(ids)} consultations × {args.contributions} contributions dans {args.base}",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
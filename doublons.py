@@ -0,0 +1,97 @@
+"""
+Détection des contributions quasi identiques (MinHash + LSH).
+Regroupe les contributions « de campagne » pour n'envoyer au modèle
+qu'un représentant par groupe, pondéré par la taille du groupe.
+"""
+
+import hashlib
+import re
+import unicodedata
+from array import array
+
+NB_PERMUTATIONS = 64
+NB_BANDES = 16              # 16 bandes de 4 lignes : candidats dès ~50 % de similarité
+SEUIL_SIMILARITE = 0.7      # similarité de Jaccard estimée pour confirmer un doublon
+TAILLE_SHINGLE = 3          # mots par shingle
+
+
+def _normaliser(texte):
+    """Minuscules, sans accents ni ponctuation."""
+    texte = unicodedata.normalize("NFKD", texte.lower())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return re.findall(r"\w+", texte)
+
+
+def _shingles(texte):
+    mots = _normaliser(texte)
+    if len(mots) < TAILLE_SHINGLE:
+        return {" ".join(mots)}
+    return {
+        " ".join(mots[i:i + TAILLE_SHINGLE])
+        for i in range(len(mots) - TAILLE_SHINGLE + 1)
+    }
+
+
+def signature_minhash(texte):
+    """
+    Signature MinHash d'un texte, sérialisée en octets pour la base.
+    Chaque shingle est haché une seule fois par SHAKE-128 en NB_PERMUTATIONS
+    valeurs de 32 bits (une par fonction de hachage), puis on garde le
+    minimum de chaque colonne.
+    """
+    colonnes = []
+    for shingle in _shingles(texte):
+        valeurs = array("I")
+        valeurs.frombytes(hashlib.shake_128(shingle.encode("utf-8")).digest(4 * NB_PERMUTATIONS))
+        colonnes.append(valeurs)
+    signature = array("I", map(min, zip(*colonnes)))
+    return signature.tobytes()
+
+
+def _lire_signature(octets):
+    signature = array("I")
+    signature.frombytes(octets)
+    return signature
+
+
+def similarite(sig_a, sig_b):
+    """Similarité de Jaccard estimée à partir de deux signatures."""
+    egales = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+    return egales / len(sig_a)
+
+
+def grouper_doublons(signatures, seuil=SEUIL_SIMILARITE):
+    """
+    Regroupe les éléments quasi identiques.
+    signatures : liste de (id, signature en octets), dans l'ordre voulu.
+    Renvoie une liste de groupes (listes d'ids), chaque groupe dans l'ordre
+    d'entrée, les groupes triés par leur premier élément.
+    """
+    ids = [element_id for element_id, _ in signatures]
+    sigs = [_lire_signature(octets) for _, octets in signatures]
+    parent = list(range(len(ids)))
+
+    def racine(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # LSH : deux éléments partageant une bande entière sont candidats
+    lignes = NB_PERMUTATIONS // NB_BANDES
+    for bande in range(NB_BANDES):
+        seaux = {}
+        debut = bande * lignes
+        for i, sig in enumerate(sigs):
+            seaux.setdefault(tuple(sig[debut:debut + lignes]), []).append(i)
+        for membres in seaux.values():
+            premier = membres[0]
+            for autre in membres[1:]:
+                ra, rb = racine(premier), racine(autre)
+                if ra != rb and similarite(sigs[premier], sigs[autre]) >= seuil:
+                    parent[max(ra, rb)] = min(ra, rb)
+
+    groupes = {}
+    for i in range(len(ids)):
+        groupes.setdefault(racine(i), []).append(ids[i])
+    return [groupes[r] for r in sorted(groupes)]
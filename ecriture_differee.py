@@ -0,0 +1,132 @@
+"""
+Écriture différée (write-behind) : les enregistrements demandés par
+l'interface sont exécutés par un thread d'écriture, regroupés dans une
+même transaction (group commit), au lieu de bloquer le thread Tk sur
+l'insertion, le COMMIT et l'attente du verrou d'un autre écrivain.
+"""
+
+import atexit
+import queue
+import sys
+import threading
+import time
+
+from database import fermer_connexion, get_connexion, transaction
+from instrumentation import consigner
+
+TAILLE_FILE = 1000       # opérations en attente au plus ; au-delà, soumettre() attend
+TAILLE_LOT = 200         # opérations au plus par transaction
+FENETRE_LOT = 0.02       # secondes d'attente d'autres opérations à regrouper
+
+
+class OperationEcriture:
+    """Écriture en attente : fonction(*args), puis on_fin(résultat, erreur)."""
+
+    def __init__(self, fonction, args, on_fin):
+        self.fonction = fonction
+        self.args = args
+        self.on_fin = on_fin
+
+
+class EcrivainDiffere:
+    """
+    File bornée d'écritures et thread d'écriture qui les exécute par lots :
+    chaque lot est une transaction (les fonctions de database.py appelées à
+    l'intérieur rejoignent la transaction englobante). Si le lot échoue, ses
+    opérations sont rejouées une à une pour qu'une seule erreur n'emporte
+    pas les autres.
+
+    on_fin(résultat, erreur) est appelé depuis le thread d'écriture, une fois
+    la transaction validée (accusé de durabilité) ou en échec : il doit
+    repasser par win.after pour toucher à l'interface. La connexion du
+    thread d'écriture passe en synchronous=FULL : chaque COMMIT est
+    synchronisé sur disque (un fsync par lot), quand les autres connexions
+    en WAL/NORMAL peuvent perdre leurs dernières transactions sur coupure
+    de courant.
+    Le thread est démarré à la première écriture ; vider() attend que tout
+    soit écrit, arreter() vide la file puis arrête le thread (aussi appelé
+    à la sortie du programme).
+    """
+
+    _FIN = object()
+
+    def __init__(self, taille_file=TAILLE_FILE, taille_lot=TAILLE_LOT, fenetre=FENETRE_LOT):
+        self.taille_lot = taille_lot
+        self.fenetre = fenetre
+        self.file = queue.Queue(maxsize=taille_file)
+        self._verrou = threading.Lock()
+        self._thread = None
+        atexit.register(self.arreter)
+
+    def soumettre(self, fonction, *args, on_fin=None):
+        """Met en file fonction(*args) ; attend si la file est pleine."""
+        with self._verrou:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._ecrire, daemon=True,
+                                                name="ecriture-differee")
+                self._thread.start()
+        self.file.put(OperationEcriture(fonction, args, on_fin))
+
+    def vider(self):
+        """Attend que toutes les opérations soumises soient écrites."""
+        self.file.join()
+
+    def arreter(self):
+        """Écrit les opérations en attente puis arrête le thread d'écriture."""
+        with self._verrou:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self.file.put(self._FIN)
+            thread.join()
+
+    # Thread d'écriture
+
+    def _ecrire(self):
+        try:
+            fin = False
+            while not fin:
+                lot = [self.file.get()]
+                limite = time.perf_counter() + self.fenetre
+                while lot[-1] is not self._FIN and len(lot) < self.taille_lot:
+                    try:
+                        lot.append(self.file.get(timeout=max(limite - time.perf_counter(), 0)))
+                    except queue.Empty:
+                        break
+                if lot[-1] is self._FIN:
+                    fin = True
+                operations = [op for op in lot if op is not self._FIN]
+                if operations:
+                    self._ecrire_lot(operations)
+                for _ in lot:
+                    self.file.task_done()
+        finally:
+            fermer_connexion()
+
+    def _ecrire_lot(self, operations):
+        debut = time.perf_counter()
+        # Hors transaction ; répété à chaque lot, la connexion pouvant être rouverte
+        get_connexion().execute("PRAGMA synchronous = FULL")
+        try:
+            with transaction(ecriture=True):
+                resultats = [(op.fonction(*op.args), None) for op in operations]
+        except Exception:
+            # Rejouer une à une : seules les opérations fautives échouent
+            resultats = []
+            for op in operations:
+                try:
+                    with transaction(ecriture=True):
+                        resultats.append((op.fonction(*op.args), None))
+                except Exception as e:
+                    resultats.append((None, e))
+        consigner("ecriture_groupee", operations=len(operations),
+                  duree_ms=round((time.perf_counter() - debut) * 1000, 3))
+
+        for op, (resultat, erreur) in zip(operations, resultats):
+            if op.on_fin:
+                try:
+                    op.on_fin(resultat, erreur)
+                except Exception:
+                    sys.excepthook(*sys.exc_info())
+
+
+ecrivain = EcrivainDiffere()
@@ -0,0 +1,292 @@
+"""
+Faux serveur Ollama pour les essais et les mesures sans modèle réel.
+Implémente /api/tags, /api/show et /api/generate (NDJSON en streaming ou
+réponse unique), avec délai avant le premier token, débit, erreurs et
+coupures de connexion réglables.
+
+Usage :
+    python faux_ollama.py [--port 11435] [--ttft 0.3] [--tokens-par-seconde 40]
+        [--tokens 200] [--taux-erreur 0.0] [--taux-coupure 0.0]
+        [--paralleles 4] [--modele qwen2:0.5b ...]
+
+puis, pour y connecter l'application ou les outils sans interface :
+    OLLAMA_URL=http://127.0.0.1:11435 python main.py
+    OLLAMA_URL=http://127.0.0.1:11435 python -m synthese --all
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODELES = ("qwen2:0.5b",)
+CONTEXTE = 32768
+
+# Vocabulaire des réponses générées
+MOTS = (
+    "la", "les", "des", "une", "participants", "proposent", "souhaitent", "pistes",
+    "cyclables", "sécurité", "quartier", "transports", "commun", "consensus",
+    "divergence", "recommandation", "thème", "principal", "plusieurs", "habitants",
+    "demandent", "davantage", "concertation", "budget", "écoles", "espaces", "verts",
+    "stationnement", "circulation", "accessibilité", "et", "de", "pour", "avec",
+)
+
+
+class GestionnaireOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.bavard:
+            super().log_message(format, *args)
+
+    # Réponses
+
+    def _json(self, code, donnees):
+        corps = json.dumps(donnees, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def _morceau(self, donnees):
+        ligne = (json.dumps(donnees, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(ligne), ligne))
+        self.wfile.flush()
+
+    def _lire_corps(self):
+        longueur = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(longueur) or b"{}")
+        except ValueError:
+            return None
+
+    # Routes
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._json(200, {"models": [
+                {"name": nom, "model": nom, "size": 0, "details": {"format": "gguf"}}
+                for nom in self.server.modeles
+            ]})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        requete = self._lire_corps()
+        if requete is None:
+            self._json(400, {"error": "invalid JSON"})
+            return
+        if self.path == "/api/show":
+            self._show(requete)
+        elif self.path == "/api/generate":
+            self._generate(requete)
+        else:
+            self._json(404, {"error": "not found"})
+
+    def _show(self, requete):
+        nom = requete.get("model") or requete.get("name")
+        if nom not in self.server.modeles:
+            self._json(404, {"error": f"model '{nom}' not found"})
+            return
+        self._json(200, {
+            "details": {"format": "gguf", "family": "faux"},
+            "model_info": {"faux.context_length": self.server.contexte},
+        })
+
+    def _generate(self, requete):
+        serveur = self.server
+        nom = requete.get("model")
+        if nom not in serveur.modeles:
+            self._json(404, {"error": f"model '{nom}' not found, try pulling it first"})
+            return
+        if serveur.tirer(serveur.taux_erreur):
+            serveur.compter("erreurs")
+            self._json(500, {"error": "erreur injectée par faux_ollama"})
+            return
+
+        prompt = requete.get("prompt", "")
+        num_predict = (requete.get("options") or {}).get("num_predict") or 0
+        nb_tokens = min(serveur.nb_tokens, num_predict) if num_predict > 0 else serveur.nb_tokens
+        tokens = serveur.texte(prompt, nb_tokens)
+        coupure = serveur.hasard(nb_tokens) if serveur.tirer(serveur.taux_coupure) else None
+
+        debut = time.perf_counter()
+        with serveur.emplacements:  # comme Ollama : N générations à la fois, les autres attendent
+            serveur.compter("requetes")
+            serveur.compter("actives")
+            try:
+                time.sleep(serveur.ttft)
+                debut_eval = time.perf_counter()
+                if requete.get("stream", True):
+                    termine = self._generer_flux(nom, tokens, coupure)
+                    if termine:
+                        self._morceau(self._final(nom, prompt, tokens, debut, debut_eval))
+                        self.wfile.write(b"0\r\n\r\n")
+                else:
+                    time.sleep(len(tokens) / serveur.tokens_par_seconde)
+                    termine = coupure is None
+                    if termine:
+                        self._json(200, self._final(nom, prompt, tokens, debut, debut_eval,
+                                                    response="".join(tokens)))
+                if not termine:
+                    serveur.compter("coupures")
+                    self.close_connection = True
+            except (BrokenPipeError, ConnectionResetError):
+                # Le client a fermé la connexion : Ollama libère l'emplacement
+                serveur.compter("abandons")
+                self.close_connection = True
+            finally:
+                serveur.compter("actives", -1)
+
+    def _generer_flux(self, nom, tokens, coupure):
+        """Envoie les tokens un par un ; renvoie False si la connexion est coupée."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        intervalle = 1 / self.server.tokens_par_seconde
+        for i, token in enumerate(tokens):
+            if i == coupure:
+                return False  # coupure injectée : pas de message final
+            if i:
+                time.sleep(intervalle)
+            self._morceau({"model": nom, "created_at": _maintenant(), "response": token, "done": False})
+        return True
+
+    def _final(self, nom, prompt, tokens, debut, debut_eval, response=""):
+        fin = time.perf_counter()
+        return {
+            "model": nom,
+            "created_at": _maintenant(),
+            "response": response,
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((fin - debut) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt) // 4 + 1,
+            "prompt_eval_duration": int((debut_eval - debut) * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int((fin - debut_eval) * 1e9),
+        }
+
+
+def _maintenant():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FauxOllama(ThreadingHTTPServer):
+    """
+    Serveur à démarrer dans le processus (essais, mesures) ou en ligne de
+    commande. port=0 choisit un port libre ; l'adresse est dans .url.
+    Les compteurs (requetes, erreurs, coupures, abandons, et générations
+    actives) permettent de vérifier le comportement du client.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, hote="127.0.0.1", ttft=0.3, tokens_par_seconde=40.0,
+                 nb_tokens=200, taux_erreur=0.0, taux_coupure=0.0, paralleles=4,
+                 modeles=MODELES, contexte=CONTEXTE, graine=None, bavard=False):
+        super().__init__((hote, port), GestionnaireOllama)
+        self.ttft = ttft
+        self.tokens_par_seconde = tokens_par_seconde
+        self.nb_tokens = nb_tokens
+        self.taux_erreur = taux_erreur
+        self.taux_coupure = taux_coupure
+        self.emplacements = threading.Semaphore(paralleles)
+        self.modeles = list(modeles)
+        self.contexte = contexte
+        self.bavard = bavard
+        self.compteurs = {"requetes": 0, "erreurs": 0, "coupures": 0, "abandons": 0, "actives": 0}
+        self._hasard = random.Random(graine)
+        self._verrou = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        hote, port = self.server_address[:2]
+        return f"http://{hote}:{port}"
+
+    def tirer(self, probabilite):
+        with self._verrou:
+            return self._hasard.random() < probabilite
+
+    def hasard(self, n):
+        with self._verrou:
+            return self._hasard.randrange(n) if n else 0
+
+    def compter(self, nom, pas=1):
+        with self._verrou:
+            self.compteurs[nom] += pas
+
+    def texte(self, prompt, nb_tokens):
+        """Tokens déterministes pour un prompt donné (mêmes entrées, même réponse)."""
+        hasard = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        return [hasard.choice(MOTS) + " " for _ in range(nb_tokens)]
+
+    def demarrer(self):
+        """Sert les requêtes dans un thread de fond ; renvoie le serveur."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True,
+                                        name="faux-ollama")
+        self._thread.start()
+        return self
+
+    def arreter(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.demarrer()
+
+    def __exit__(self, *exc):
+        self.arreter()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Faux serveur Ollama pour essais et mesures.")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--ttft", type=float, default=0.3,
+                        help="secondes avant le premier token (défaut : 0.3)")
+    parser.add_argument("--tokens-par-seconde", type=float, default=40.0,
+                        help="débit de génération (défaut : 40)")
+    parser.add_argument("--tokens", type=int, default=200,
+                        help="tokens par réponse, borné par num_predict (défaut : 200)")
+    parser.add_argument("--taux-erreur", type=float, default=0.0,
+                        help="probabilité d'une réponse HTTP 500")
+    parser.add_argument("--taux-coupure", type=float, default=0.0,
+                        help="probabilité de couper la connexion en cours de génération")
+    parser.add_argument("--paralleles", type=int, default=4,
+                        help="générations simultanées, les suivantes attendent (défaut : 4)")
+    parser.add_argument("--modele", action="append", dest="modeles",
+                        help=f"modèle annoncé, répétable (défaut : {', '.join(MODELES)})")
+    parser.add_argument("--graine", type=int, help="graine des tirages aléatoires")
+    parser.add_argument("--bavard", action="store_true", help="journaliser chaque requête")
+    args = parser.parse_args(argv)
+
+    serveur = FauxOllama(
+        port=args.port, hote=args.hote, ttft=args.ttft,
+        tokens_par_seconde=args.tokens_par_seconde, nb_tokens=args.tokens,
+        taux_erreur=args.taux_erreur, taux_coupure=args.taux_coupure,
+        paralleles=args.paralleles, modeles=args.modeles or MODELES,
+        graine=args.graine, bavard=args.bavard
+    )
+    print(f"Faux Ollama sur {serveur.url} (OLLAMA_URL={serveur.url})", file=sys.stderr)
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serveur.server_close()
+        print(f"\n{serveur.compteurs}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
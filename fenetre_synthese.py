@@ -0,0 +1,547 @@
+"""
+Fenêtre de synthèse des contributions avec IA locale (Ollama).
+Design épuré fond blanc avec contours noirs
+Streaming pour affichage en temps réel
+"""
+
+import tkinter as tk
+from tkinter import messagebox
+import ttkbootstrap as ttk
+from ttkbootstrap.scrolled import ScrolledText
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+import instrumentation
+from database import count_contributions, get_consultation_details
+from synthese import (
+    DEFAULT_MODEL, ErreurOllama, JetonAnnulation, get_available_models,
+    preparer_synthese, planifier_plan
+)
+
+# Configuration des styles
+FONT_TITLE = ("Segoe UI", 20, "bold")
+FONT_SUBTITLE = ("Segoe UI", 11)
+FONT_NORMAL = ("Segoe UI", 11)
+FONT_SMALL = ("Segoe UI", 10)
+
+
+class RenduTamponne:
+    """
+    Affichage d'un flux de texte dans un widget Text sans saturer Tk :
+    le thread de génération dépose les morceaux dans une file, et la boucle
+    Tk les insère en une seule fois toutes les INTERVALLE_MS millisecondes.
+    """
+
+    INTERVALLE_MS = 40
+    _EFFACER = object()
+
+    def __init__(self, text_widget, intervalle_ms=INTERVALLE_MS):
+        self.text_widget = text_widget
+        self.intervalle_ms = intervalle_ms
+        self.file = queue.SimpleQueue()
+        self._actif = False
+
+    # Appelables depuis n'importe quel thread
+    def ajouter(self, texte):
+        self.file.put(texte)
+
+    def effacer(self):
+        self.file.put(self._EFFACER)
+
+    def remplacer(self, texte):
+        self.effacer()
+        self.ajouter(texte)
+
+    # Thread Tk uniquement
+    def demarrer(self):
+        if not self._actif:
+            self._actif = True
+            self.text_widget.after(self.intervalle_ms, self._trame)
+
+    def arreter(self):
+        """Affiche ce qui reste dans la file puis arrête le rafraîchissement."""
+        self._actif = False
+        self._vider()
+
+    def _trame(self):
+        if not self.text_widget.winfo_exists():
+            self._actif = False
+            return
+        if self._actif and self._vider():
+            self.text_widget.after(self.intervalle_ms, self._trame)
+
+    def _vider(self):
+        effacer = False
+        morceaux = []
+        while True:
+            try:
+                element = self.file.get_nowait()
+            except queue.Empty:
+                break
+            if element is self._EFFACER:
+                effacer = True
+                morceaux = []
+            else:
+                morceaux.append(element)
+
+        if not (effacer or morceaux):
+            return True
+        try:
+            self.text_widget.config(state="normal")
+            if effacer:
+                self.text_widget.delete("1.0", "end")
+            if morceaux:
+                self.text_widget.insert("end", "".join(morceaux))
+                self.text_widget.see("end")
+            self.text_widget.config(state="disabled")
+        except tk.TclError:
+            # Fenêtre fermée pendant la génération
+            self._actif = False
+            return False
+        return True
+
+
+def message_erreur(erreur):
+    """Texte affiché et statut correspondant à une erreur de génération."""
+    if isinstance(erreur, requests.exceptions.ConnectionError):
+        return "Impossible de se connecter à Ollama. Vérifiez qu'il est lancé.", "Erreur de connexion"
+    if isinstance(erreur, ErreurOllama):
+        return str(erreur), "Erreur"
+    return f"Erreur: {str(erreur)}", "Erreur"
+
+
+def formater_metriques(mesures):
+    """Mesures d'une génération (voir synthese.streamer_prompt) pour la barre d'état."""
+    parties = []
+    if mesures.get("premier_token_ms") is not None:
+        parties.append(f"1er token {mesures['premier_token_ms']} ms")
+    parties.append(f"{mesures['tokens']} tokens")
+    if mesures.get("tokens_par_s"):
+        parties.append(f"{mesures['tokens_par_s']:.1f} tokens/s")
+    if mesures.get("tokens_prompt"):
+        parties.append(f"prompt {mesures['tokens_prompt']} tokens")
+    return " · ".join(parties)
+
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="synthese-io")
+
+
+def _en_arriere_plan(win, fonction, callback, on_erreur=None):
+    """
+    Exécute fonction() sur l'exécuteur de fond, puis callback(résultat)
+    (ou on_erreur(exception)) dans le thread Tk, si la fenêtre existe encore.
+    """
+    def appeler(rappel, valeur):
+        # Thread Tk : la fenêtre a pu être fermée depuis la planification
+        if win.winfo_exists():
+            rappel(valeur)
+
+    def termine(future):
+        try:
+            erreur = future.exception()
+            if erreur is None:
+                win.after(0, appeler, callback, future.result())
+            elif on_erreur:
+                win.after(0, appeler, on_erreur, erreur)
+        except (tk.TclError, RuntimeError):
+            pass  # fenêtre fermée entre-temps
+    _executor.submit(fonction).add_done_callback(termine)
+
+
+def _planifier(win, jeton, fonction, *args):
+    """
+    win.after(0, ...) depuis un thread de génération : ignoré si la fenêtre
+    s'est désabonnée (jeton annulé) ou a été détruite entre-temps.
+    """
+    if jeton.est_annule:
+        return
+    try:
+        win.after(0, fonction, *args)
+    except (tk.TclError, RuntimeError):
+        pass  # fenêtre fermée
+
+
+def afficher_synthese(root, consultation_id, consultation_nom):
+    """Affiche la fenêtre de synthèse pour une consultation."""
+    
+    # Données chargées en arrière-plan après l'ouverture de la fenêtre
+    etat = {"details": None, "abonnement": None, "jeton": None, "rendu": None,
+            "nb_contributions": None, "modeles": None}
+    
+    # Créer la fenêtre
+    win = ttk.Toplevel(root)
+    win.title(f"Synthèse - {consultation_nom}")
+    win.geometry("850x650")
+    win.resizable(True, True)
+    win.configure(bg="white")
+    
+    # Centrer la fenêtre
+    win.place_window_center()
+    
+    # Rendre modale
+    win.transient(root)
+    win.grab_set()
+    
+    # Container principal
+    main_frame = ttk.Frame(win, bootstyle="light", padding=25)
+    main_frame.pack(fill="both", expand=True)
+    
+    # Header
+    header_frame = ttk.Frame(main_frame, bootstyle="light")
+    header_frame.pack(fill="x", pady=(0, 15))
+    
+    ttk.Label(
+        header_frame,
+        text="Synthèse IA",
+        font=FONT_TITLE,
+        foreground="black"
+    ).pack(side="left")
+    
+    def fermer():
+        # Se désabonner de la génération : annulée si aucune autre fenêtre ne l'attend
+        if etat["abonnement"]:
+            etat["jeton"].annuler()
+            etat["abonnement"].annuler()
+        if etat["rendu"]:
+            etat["rendu"].arreter()
+        win.destroy()
+    
+    win.protocol("WM_DELETE_WINDOW", fermer)
+    
+    ttk.Button(
+        header_frame,
+        text="Fermer",
+        bootstyle="secondary-link",
+        command=fermer
+    ).pack(side="right")
+    
+    # Info consultation
+    ttk.Label(
+        main_frame,
+        text=consultation_nom,
+        font=FONT_SUBTITLE,
+        foreground="gray",
+        wraplength=750
+    ).pack(anchor="w")
+    
+    nb_label = ttk.Label(
+        main_frame,
+        text="Chargement des contributions...",
+        font=FONT_SMALL,
+        foreground="gray"
+    )
+    nb_label.pack(anchor="w", pady=(5, 15))
+    
+    # Ligne de séparation
+    sep = ttk.Frame(main_frame, height=1, bootstyle="dark")
+    sep.pack(fill="x", pady=(0, 15))
+    
+    # Sélection du modèle
+    model_frame = ttk.Frame(main_frame, bootstyle="light")
+    model_frame.pack(fill="x", pady=(0, 15))
+    
+    ttk.Label(
+        model_frame,
+        text="Modèle :",
+        font=FONT_NORMAL,
+        foreground="black"
+    ).pack(side="left", padx=(0, 10))
+    
+    model_var = ttk.StringVar(value="Chargement des modèles...")
+    
+    # Combobox avec bordure
+    combo_border = ttk.Frame(model_frame, bootstyle="dark", padding=1)
+    combo_border.pack(side="left")
+    
+    model_combo = ttk.Combobox(
+        combo_border,
+        textvariable=model_var,
+        values=[],
+        state="disabled",
+        width=25,
+        font=FONT_NORMAL
+    )
+    model_combo.pack()
+    
+    # Bouton générer (activé une fois les contributions et les modèles chargés)
+    btn_generer = ttk.Button(
+        model_frame,
+        text="Générer la synthèse",
+        bootstyle="dark",
+        padding=(20, 8),
+        state="disabled"
+    )
+    btn_generer.pack(side="right")
+    
+    # Bouton d'arrêt (actif pendant la génération)
+    btn_stop = ttk.Button(
+        model_frame,
+        text="Arrêter",
+        bootstyle="danger-outline",
+        padding=(20, 8),
+        state="disabled"
+    )
+    btn_stop.pack(side="right", padx=(0, 10))
+    
+    # Mise à jour incrémentale de la dernière synthèse
+    incremental_var = ttk.BooleanVar(value=True)
+    ttk.Checkbutton(
+        model_frame,
+        text="Mise à jour incrémentale",
+        variable=incremental_var,
+        bootstyle="dark"
+    ).pack(side="right", padx=(0, 15))
+    
+    # Indicateur de statut
+    status_var = ttk.StringVar(value="")
+    status_label = ttk.Label(
+        main_frame,
+        textvariable=status_var,
+        font=FONT_SMALL,
+        foreground="gray"
+    )
+    status_label.pack(anchor="w")
+    
+    # Taille du prompt face au budget de contexte du modèle
+    budget_var = ttk.StringVar(value="")
+    ttk.Label(
+        main_frame,
+        textvariable=budget_var,
+        font=FONT_SMALL,
+        foreground="gray"
+    ).pack(anchor="w", pady=(0, 10))
+    
+    # Zone de résultat avec bordure
+    result_border = ttk.Frame(main_frame, bootstyle="dark", padding=1)
+    result_border.pack(fill="both", expand=True)
+    
+    result_text = ScrolledText(result_border, autohide=True)
+    result_text.pack(fill="both", expand=True)
+    result_text.text.config(
+        font=("Consolas", 10),
+        wrap="word",
+        state="disabled",
+        padx=15,
+        pady=15,
+        bg="white"
+    )
+    
+    def afficher_texte(texte):
+        result_text.text.config(state="normal")
+        result_text.text.delete("1.0", "end")
+        result_text.text.insert("1.0", texte)
+        result_text.text.config(state="disabled")
+    
+    def question_consultation():
+        details = etat["details"]
+        return details[1] if details else consultation_nom
+    
+    def afficher_budget(plan):
+        tokens, budget, contexte = plan["tokens_prompt"], plan["budget_prompt"], plan["contexte"]
+        if plan["lots"]:
+            budget_var.set(
+                f"Prompt : ~{tokens} tokens, au-delà du budget de {budget} (contexte {contexte}) : "
+                f"synthèse par lots ({len(plan['lots'])} lots)"
+            )
+        else:
+            budget_var.set(f"Prompt : ~{tokens} tokens sur un budget de {budget} (contexte {contexte})")
+    
+    def activer_generation():
+        # Génération possible une fois les contributions et les modèles chargés
+        if etat["nb_contributions"] and etat["modeles"]:
+            model_combo.config(state="readonly")
+            btn_generer.config(state="normal")
+    
+    # Chargement asynchrone des contributions et des modèles : seul le nombre
+    # de contributions est lu ici, les textes sont parcourus à la préparation
+    def on_donnees(resultat):
+        nb_contributions, details = resultat
+        etat["details"] = details
+        
+        if not nb_contributions:
+            nb_label.config(text="Aucune contribution")
+            afficher_texte("Il n'y a pas encore de contributions pour cette consultation.")
+            return
+        
+        nb_label.config(
+            text=f"{nb_contributions} contribution{'s' if nb_contributions > 1 else ''} à analyser"
+        )
+        etat["nb_contributions"] = nb_contributions
+        activer_generation()
+    
+    def on_modeles(models):
+        if not models:
+            models = [DEFAULT_MODEL]
+        etat["modeles"] = models
+        model_combo.config(values=models, state="readonly")
+        model_var.set(models[0])
+        activer_generation()
+    
+    def on_erreur_chargement(erreur):
+        nb_label.config(text="Erreur de chargement")
+        status_var.set(f"Erreur: {erreur}")
+    
+    _en_arriere_plan(
+        win,
+        lambda: (count_contributions(consultation_id), get_consultation_details(consultation_id)),
+        on_donnees,
+        on_erreur_chargement
+    )
+    _en_arriere_plan(win, get_available_models, on_modeles)
+    
+    # Fonction de génération
+    def lancer_synthese():
+        model = model_var.get()
+        incremental = incremental_var.get()
+        
+        question = question_consultation()
+        
+        # Le plan et sa clé de cache valent pour ce modèle : pas de changement en cours de route
+        btn_generer.config(state="disabled")
+        model_combo.config(state="disabled")
+        status_var.set("Préparation...")
+        budget_var.set("")
+        
+        # Cache, santé d'Ollama, delta et budget de tokens : déterminés hors du thread Tk
+        def preparer():
+            return preparer_synthese(consultation_id, model, incremental, question=question)
+        
+        def on_erreur_preparation(erreur):
+            status_var.set(f"Erreur: {erreur}")
+            activer_generation()
+        
+        _en_arriere_plan(
+            win, preparer, lambda plan: demarrer_generation(plan, model, question), on_erreur_preparation
+        )
+    
+    def demarrer_generation(plan, model, question):
+        if "cache" in plan:
+            afficher_texte(plan["cache"])
+            status_var.set("Synthèse terminée (depuis le cache)")
+            activer_generation()
+            return
+        
+        if plan.get("indisponible"):
+            status_var.set("")
+            activer_generation()
+            messagebox.showerror(
+                "Ollama non disponible",
+                "Ollama n'est pas en cours d'exécution.\n\n"
+                "Pour l'installer :\n"
+                "1. Téléchargez sur https://ollama.ai\n"
+                "2. Installez et lancez Ollama\n"
+                "3. Exécutez : ollama pull mistral\n"
+                "4. Réessayez"
+            )
+            return
+        
+        nb_contributions = plan["nb_contributions"]
+        nouvelles = plan["nouvelles"]
+        representants = plan["representants"]
+        
+        # UI loading
+        if nouvelles:
+            nb_nouvelles = sum(poids for _, poids in nouvelles)
+            statut_generation = (
+                f"Mise à jour avec {nb_nouvelles} nouvelle(s) contribution(s)... "
+                "(la réponse s'affiche en temps réel)"
+            )
+        elif len(representants) < nb_contributions:
+            statut_generation = (
+                f"Génération en cours sur {len(representants)} contributions distinctes "
+                f"({nb_contributions} au total)... (la réponse s'affiche en temps réel)"
+            )
+        else:
+            statut_generation = "Génération en cours... (la réponse s'affiche en temps réel)"
+        status_var.set("En file d'attente...")
+        afficher_budget(plan)
+        
+        afficher_texte("Connexion au modèle IA...\n")
+        
+        # Les morceaux générés sont affichés par trames regroupées
+        rendu = RenduTamponne(result_text.text)
+        rendu.demarrer()
+        etat["rendu"] = rendu
+        
+        premier = [True]
+        mesures = {}
+        
+        def on_morceau(chunk):
+            # Le premier morceau reçu remplace le texte d'attente
+            if premier[0]:
+                premier[0] = False
+                rendu.remplacer(chunk)
+            else:
+                rendu.ajouter(chunk)
+        
+        # Jeton propre à cette fenêtre : annulé, les rappels ne touchent plus l'interface
+        jeton = JetonAnnulation()
+        
+        def on_position(rang):
+            if rang:
+                _planifier(win, jeton, status_var.set, f"En file d'attente (position {rang})...")
+            else:
+                _planifier(win, jeton, status_var.set, statut_generation)
+        
+        def on_statut(texte):
+            _planifier(win, jeton, status_var.set, texte)
+        
+        def afficher_metriques(nouvelles_mesures):
+            mesures.update(nouvelles_mesures)
+            status_var.set(f"Génération en cours : {formater_metriques(mesures)}")
+        
+        def on_metriques(nouvelles_mesures):
+            _planifier(win, jeton, afficher_metriques, nouvelles_mesures)
+        
+        def terminer(statut):
+            rendu.arreter()
+            if mesures and statut == "Synthèse terminée":
+                statut = f"{statut} ({formater_metriques(mesures)})"
+            status_var.set(statut)
+            etat["abonnement"] = None
+            btn_stop.config(state="disabled")
+            activer_generation()
+        
+        def on_fin(texte, erreur):
+            if erreur is None:
+                _planifier(win, jeton, terminer, "Synthèse terminée")
+            else:
+                message, statut = message_erreur(erreur)
+                rendu.remplacer(message)
+                _planifier(win, jeton, terminer, statut)
+        
+        # Génération confiée au planificateur global : delta, hiérarchique si le
+        # prompt unique déborde, ou complète ; partagée si une autre fenêtre
+        # demande la même synthèse
+        etat["jeton"] = jeton
+        btn_stop.config(state="normal")
+        etat["abonnement"] = planifier_plan(
+            plan, consultation_id, nb_contributions, question, model,
+            on_morceau=on_morceau, on_statut=on_statut, on_position=on_position, on_fin=on_fin,
+            # Mesures en direct dans la barre d'état si l'instrumentation est activée
+            on_metriques=on_metriques if instrumentation.ACTIVE else None
+        )
+    
+    def arreter():
+        if etat["abonnement"]:
+            etat["jeton"].annuler()
+            etat["abonnement"].annuler()
+            etat["abonnement"] = None
+            # Plus aucun rappel ne touche l'interface : on affiche ce qui a été reçu
+            etat["rendu"].arreter()
+            status_var.set("Synthèse interrompue")
+            btn_stop.config(state="disabled")
+            activer_generation()
+    
+    btn_generer.config(command=lancer_synthese)
+    btn_stop.config(command=arreter)
+    
+    # Note sur la performance
+    perf_label = ttk.Label(
+        main_frame,
+        text="💡 Astuce : Pour une synthèse plus rapide, utilisez un modèle léger comme 'phi3' ou 'llama3.2:1b'",
+        font=FONT_SMALL,
+        foreground="gray"
+    )
+    perf_label.pack(anchor="w", pady=(10, 0))
@@ -0,0 +1,183 @@
+"""
+Import en masse de contributions depuis des fichiers CSV ou JSONL.
+Lecture en flux, validation ligne à ligne, insertion par lots transactionnels
+
+Usage :
+    python import_contributions.py fichier.csv [fichier.jsonl ...]
+        [--consultation ID] [--lot 1000] [--rejets rejets.jsonl]
+
+Colonnes attendues : consultation_id (facultative si --consultation) et texte.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from database import init_db, enregistrer_contributions_lot, get_consultation_ids
+from validation import erreur_contribution
+
+TAILLE_LOT = 1000
+
+
+class RapportImport:
+    """Compteurs d'un import : lignes lues, importées, rejetées, durée."""
+
+    def __init__(self):
+        self.lues = 0
+        self.importees = 0
+        self.rejetees = 0
+        self.debut = time.perf_counter()
+
+    @property
+    def duree(self):
+        return time.perf_counter() - self.debut
+
+    @property
+    def lignes_par_seconde(self):
+        return self.lues / self.duree if self.duree > 0 else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.lues} lignes lues, {self.importees} importées, "
+            f"{self.rejetees} rejetées en {self.duree:.2f} s "
+            f"({self.lignes_par_seconde:.0f} lignes/s)"
+        )
+
+
+def lire_lignes(chemin):
+    """
+    Parcourt un fichier CSV ou JSONL sans le charger en mémoire.
+    Produit (numéro de ligne, dictionnaire) ; un dictionnaire None signale
+    une ligne illisible. Les octets invalides en UTF-8 sont conservés en
+    surrogateescape, pour que valider_ligne rejette la ligne sans
+    interrompre la lecture.
+    """
+    if chemin.lower().endswith((".jsonl", ".ndjson")):
+        with open(chemin, encoding="utf-8", errors="surrogateescape") as f:
+            for numero, ligne in enumerate(f, start=1):
+                if not ligne.strip():
+                    continue
+                try:
+                    donnees = json.loads(ligne)
+                except ValueError:
+                    donnees = None
+                yield numero, donnees if isinstance(donnees, dict) else None
+    else:
+        # sys.maxsize dépasse le long C de Windows (OverflowError)
+        csv.field_size_limit(2**31 - 1)
+        with open(chemin, encoding="utf-8-sig", errors="surrogateescape", newline="") as f:
+            # Numéro de ligne = ligne d'en-tête + 1
+            for numero, donnees in enumerate(csv.DictReader(f), start=2):
+                yield numero, donnees
+
+
+def valider_ligne(donnees, consultation_defaut, consultations):
+    """Renvoie ((consultation_id, texte), None) ou (None, raison du rejet)."""
+    if donnees is None:
+        return None, "ligne illisible"
+
+    consultation_id = donnees.get("consultation_id") or consultation_defaut
+    try:
+        consultation_id = int(consultation_id)
+    except (TypeError, ValueError):
+        return None, "consultation_id manquant ou invalide"
+    if consultation_id not in consultations:
+        return None, f"consultation {consultation_id} inexistante"
+
+    texte = donnees.get("texte") or ""
+    if not isinstance(texte, str):
+        return None, "texte invalide"
+    try:
+        texte.encode("utf-8")
+    except UnicodeEncodeError:
+        return None, "encodage invalide (UTF-8 attendu)"
+    texte = texte.strip()
+    erreur = erreur_contribution(texte)
+    if erreur:
+        return None, erreur[1]
+
+    return (consultation_id, texte), None
+
+
+def importer_fichier(chemin, consultation_id=None, taille_lot=TAILLE_LOT,
+                     on_rejet=None, on_lot=None, rapport=None):
+    """
+    Importe les contributions d'un fichier par lots de taille_lot lignes,
+    chaque lot dans sa propre transaction. Les lignes invalides sont
+    signalées à on_rejet(chemin, numéro, raison) sans interrompre l'import.
+    on_lot(rapport) est appelé après chaque lot validé.
+    """
+    rapport = rapport or RapportImport()
+    consultations = get_consultation_ids()
+    lot = []
+
+    for numero, donnees in lire_lignes(chemin):
+        rapport.lues += 1
+        ligne, raison = valider_ligne(donnees, consultation_id, consultations)
+        if ligne is None:
+            rapport.rejetees += 1
+            if on_rejet:
+                on_rejet(chemin, numero, raison)
+            continue
+
+        lot.append(ligne)
+        if len(lot) >= taille_lot:
+            rapport.importees += enregistrer_contributions_lot(lot)
+            lot = []
+            if on_lot:
+                on_lot(rapport)
+
+    if lot:
+        rapport.importees += enregistrer_contributions_lot(lot)
+        if on_lot:
+            on_lot(rapport)
+
+    return rapport
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Importe des contributions depuis des fichiers CSV ou JSONL."
+    )
+    parser.add_argument("fichiers", nargs="+", help="fichiers .csv ou .jsonl")
+    parser.add_argument("--consultation", type=int,
+                        help="consultation par défaut si la colonne consultation_id est absente")
+    parser.add_argument("--lot", type=int, default=TAILLE_LOT,
+                        help=f"lignes par transaction (défaut : {TAILLE_LOT})")
+    parser.add_argument("--rejets", help="fichier JSONL où consigner les lignes rejetées")
+    args = parser.parse_args(argv)
+
+    init_db()
+    rapport = RapportImport()
+    rejets = open(args.rejets, "w", encoding="utf-8") if args.rejets else None
+
+    def on_rejet(chemin, numero, raison):
+        if rejets:
+            rejets.write(json.dumps(
+                {"fichier": chemin, "ligne": numero, "raison": raison},
+                ensure_ascii=False
+            ) + "\n")
+
+    def on_lot(r):
+        print(f"\r{r}", end="", file=sys.stderr, flush=True)
+
+    try:
+        for chemin in args.fichiers:
+            if not os.path.exists(chemin):
+                print(f"Fichier introuvable : {chemin}", file=sys.stderr)
+                continue
+            importer_fichier(chemin, args.consultation, args.lot,
+                             on_rejet=on_rejet, on_lot=on_lot, rapport=rapport)
+    finally:
+        if rejets:
+            rejets.close()
+
+    print(f"\r{rapport}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Instrumentation facultative : durée et nombre de lignes de chaque appel à
+database.py, mesures de chaque génération (premier token, tokens, débit,
+taille du prompt), consignées dans un journal JSONL tournant.
+
+Activée au lancement par la variable d'environnement CONSULTATION_METRIQUES
+(chemin du journal, ou 1 pour metriques.jsonl). Inactive, les fonctions
+décorées par @instrumente sont laissées telles quelles : aucun surcoût.
+"""
+
+import atexit
+import functools
+import os
+import queue
+import threading
+import time
+
+VARIABLE = "CONSULTATION_METRIQUES"
+JOURNAL_DEFAUT = "metriques.jsonl"
+TAILLE_MAX_JOURNAL = 5 * 1024 * 1024   # octets avant rotation
+NB_ANCIENS_JOURNAUX = 2                 # metriques.jsonl.1, metriques.jsonl.2
+
+
+def _chemin_journal():
+    valeur = os.environ.get(VARIABLE, "").strip()
+    if valeur in ("", "0"):
+        return None
+    return JOURNAL_DEFAUT if valeur == "1" else valeur
+
+
+class JournalMetriques:
+    """
+    Journal JSONL écrit par un thread de fond, par lots : consigner() ne
+    fait que déposer l'événement dans une file. Au-delà de taille_max, le
+    fichier est renommé en .1 (les plus anciens décalés, le dernier supprimé).
+    """
+
+    _FIN = object()
+
+    def __init__(self, chemin, taille_max=TAILLE_MAX_JOURNAL, nb_anciens=NB_ANCIENS_JOURNAUX):
+        self.chemin = chemin
+        self.taille_max = taille_max
+        self.nb_anciens = nb_anciens
+        self.file = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._ecrire, daemon=True, name="metriques")
+        self._thread.start()
+        atexit.register(self.fermer)
+
+    def consigner(self, evenement):
+        self.file.put(evenement)
+
+    def fermer(self):
+        """Écrit les événements en attente puis arrête le thread."""
+        if self._thread.is_alive():
+            self.file.put(self._FIN)
+            self._thread.join(timeout=2)
+
+    def _tourner(self):
+        for n in range(self.nb_anciens, 0, -1):
+            ancien = f"{self.chemin}.{n - 1}" if n > 1 else self.chemin
+            if os.path.exists(ancien):
+                os.replace(ancien, f"{self.chemin}.{n}")
+
+    def _ecrire(self):
+        import json
+
+        fin = False
+        while not fin:
+            evenements = [self.file.get()]
+            while True:
+                try:
+                    evenements.append(self.file.get_nowait())
+                except queue.Empty:
+                    break
+            if self._FIN in evenements:
+                fin = True
+                evenements = [e for e in evenements if e is not self._FIN]
+
+            try:
+                if os.path.exists(self.chemin) and os.path.getsize(self.chemin) > self.taille_max:
+                    self._tourner()
+                with open(self.chemin, "a", encoding="utf-8") as f:
+                    for evenement in evenements:
+                        f.write(json.dumps(evenement, ensure_ascii=False, default=str) + "\n")
+            except OSError:
+                pass  # les mesures ne doivent jamais gêner l'application
+
+
+_chemin = _chemin_journal()
+journal = JournalMetriques(_chemin) if _chemin else None
+ACTIVE = journal is not None
+
+
+def consigner(type_evenement, **donnees):
+    """Ajoute un événement au journal (sans effet si l'instrumentation est inactive)."""
+    if journal:
+        journal.consigner({
+            "t": round(time.time(), 3),
+            "type": type_evenement,
+            "thread": threading.current_thread().name,
+            **donnees,
+        })
+
+
+def _lignes(resultat):
+    """Nombre de lignes d'un résultat de requête."""
+    if resultat is None:
+        return 0
+    if isinstance(resultat, (list, dict, set)):
+        return len(resultat)
+    return 1
+
+
+def instrumente(fonction=None, *, lignes=_lignes):
+    """
+    Décorateur des fonctions de database.py : consigne le nom, la durée et
+    le nombre de lignes (lignes(résultat)) de chaque appel. Les générateurs
+    sont mesurés jusqu'à épuisement, une ligne par élément produit.
+    """
+    if fonction is None:
+        return lambda f: instrumente(f, lignes=lignes)
+    if not ACTIVE:
+        return fonction
+
+    import inspect  # coûteux à importer : seulement si l'instrumentation est active
+
+    nom = fonction.__name__
+
+    if inspect.isgeneratorfunction(fonction):
+        @functools.wraps(fonction)
+        def generateur(*args, **kwargs):
+            debut = time.perf_counter()
+            nb = 0
+            try:
+                for element in fonction(*args, **kwargs):
+                    nb += 1
+                    yield element
+            finally:
+                consigner("requete", nom=nom, lignes=nb,
+                          duree_ms=round((time.perf_counter() - debut) * 1000, 3))
+        return generateur
+
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        debut = time.perf_counter()
+        try:
+            resultat = fonction(*args, **kwargs)
+        except Exception as e:
+            consigner("requete", nom=nom, lignes=0, erreur=type(e).__name__,
+                      duree_ms=round((time.perf_counter() - debut) * 1000, 3))
+            raise
+        consigner("requete", nom=nom, lignes=lignes(resultat),
+                  duree_ms=round((time.perf_counter() - debut) * 1000, 3))
+        return resultat
+    return enveloppe
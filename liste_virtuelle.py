@@ -0,0 +1,228 @@
+"""
+Liste virtualisée à lignes de hauteur fixe
+Seules les lignes visibles sont construites, puis recyclées au défilement
+"""
+
+import tkinter as tk
+import ttkbootstrap as ttk
+
+
+class ListeVirtuelle(ttk.Frame):
+    """
+    Liste défilante qui ne construit qu'un petit nombre de widgets et les
+    réaffecte aux lignes visibles. Les données sont chargées par pages.
+
+    - creer_ligne(parent) renvoie un widget disposant d'une méthode remplir(ligne)
+    - charger_page(apres_id, limite) renvoie les lignes suivantes (id en tête)
+    - compter() renvoie le nombre total de lignes
+    - id_au_rang(rang), facultatif, renvoie l'id de la ligne de ce rang (ou
+      None) : la pagination par clé reprend alors directement à la page
+      visible, sans lire les précédentes
+    """
+
+    def __init__(self, parent, hauteur_ligne, creer_ligne, charger_page, compter,
+                 taille_page=50, espacement=8, id_au_rang=None):
+        super().__init__(parent)
+        self.hauteur_ligne = hauteur_ligne
+        self.creer_ligne = creer_ligne
+        self.charger_page = charger_page
+        self.compter = compter
+        self.id_au_rang = id_au_rang
+        self.taille_page = taille_page
+        self.espacement = espacement
+
+        self.total = 0
+        # Pages chargées par numéro (la page n couvre les rangs n*taille_page...)
+        self._pages = {}
+        # Index des lignes chargées et widgets affichés, par id
+        self._index_par_id = {}
+        self._widget_par_id = {}
+        # Widgets recyclés : [widget, item canvas, index affiché]
+        self._pool = []
+        self._redessin_prevu = False
+        # Dernières zone de défilement et vue appliquées
+        self._zone = None
+        self._vue = None
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical")
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.canvas = tk.Canvas(
+            self, highlightthickness=0, bd=0, bg="white", yscrollincrement=20
+        )
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.scrollbar.config(command=self.canvas.yview)
+        self.canvas.config(yscrollcommand=self._on_defilement)
+
+        self.canvas.bind("<Configure>", lambda e: self._planifier_redessin())
+        self.canvas.bind("<Enter>", self._activer_molette)
+        self.canvas.bind("<Leave>", self._desactiver_molette)
+
+    # --- Données -------------------------------------------------------
+
+    def recharger(self, total=None, premiere_page=None):
+        """
+        Vide le cache de lignes et recharge depuis le début. total et
+        premiere_page, s'ils ont déjà été lus (hors du thread Tk par exemple),
+        évitent les requêtes correspondantes.
+        """
+        self._pages.clear()
+        self._index_par_id.clear()
+        self._widget_par_id.clear()
+        self.total = self.compter() if total is None else total
+        if premiere_page is not None:
+            self._ajouter_page(0, premiere_page)
+        for slot in self._pool:
+            slot[2] = None
+        self._maj_zone_defilement()
+        self.canvas.yview_moveto(0)
+        self._planifier_redessin()
+
+    def _charger_pages(self, premier, dernier):
+        """Charge les pages non encore lues couvrant les index [premier, dernier)."""
+        for numero in range(premier // self.taille_page, (dernier - 1) // self.taille_page + 1):
+            if numero not in self._pages:
+                self._lire_page(numero)
+
+    def _lire_page(self, numero):
+        apres_id = self._apres_id(numero)
+        page = [] if apres_id is None else self.charger_page(apres_id, self.taille_page)
+        self._ajouter_page(numero, page)
+
+    def _apres_id(self, numero):
+        """Id après lequel commence la page (None : au-delà de la fin)."""
+        if numero == 0:
+            return 0
+        if numero - 1 not in self._pages:
+            if self.id_au_rang is not None:
+                return self.id_au_rang(numero * self.taille_page - 1)
+            # Sans saut possible, les pages précédentes sont lues dans l'ordre
+            derniere = max((n for n in self._pages if n < numero), default=-1)
+            for n in range(derniere + 1, numero):
+                self._lire_page(n)
+        precedente = self._pages[numero - 1]
+        return precedente[-1][0] if len(precedente) == self.taille_page else None
+
+    def _ajouter_page(self, numero, page):
+        page = list(page)
+        self._pages[numero] = page
+        for k, ligne in enumerate(page):
+            self._index_par_id[ligne[0]] = numero * self.taille_page + k
+
+    def _ligne(self, index):
+        """Ligne chargée de cet index, ou None."""
+        page = self._pages.get(index // self.taille_page)
+        k = index % self.taille_page
+        return page[k] if page is not None and k < len(page) else None
+
+    def maj_ligne(self, ligne):
+        """Remplace une ligne déjà chargée et ne redessine que sa carte."""
+        index = self._index_par_id.get(ligne[0])
+        if index is None:
+            return
+        self._pages[index // self.taille_page][index % self.taille_page] = ligne
+        widget = self._widget_par_id.get(ligne[0])
+        if widget is not None:
+            widget.remplir(ligne)
+
+    def ajouter_ligne(self, ligne):
+        """Ajoute une ligne en fin de liste (son id est le plus grand)."""
+        index = self.total
+        self.total += 1
+        # Sinon la pagination par clé la chargera avec sa page
+        page = self._pages.get(index // self.taille_page)
+        if page is not None and len(page) == index % self.taille_page:
+            self._index_par_id[ligne[0]] = index
+            page.append(ligne)
+        self._maj_zone_defilement()
+        self._planifier_redessin()
+
+    def _maj_zone_defilement(self):
+        # Modifier scrollregion rappelle yscrollcommand : seulement si elle change
+        zone = (0, 0, self.canvas.winfo_width(), self.total * self.hauteur_ligne)
+        if zone != self._zone:
+            self._zone = zone
+            self.canvas.config(scrollregion=zone)
+
+    # --- Rendu ---------------------------------------------------------
+
+    def _on_defilement(self, debut, fin):
+        self.scrollbar.set(debut, fin)
+        if (debut, fin) != self._vue:
+            self._vue = (debut, fin)
+            self._planifier_redessin()
+
+    def _planifier_redessin(self):
+        if not self._redessin_prevu:
+            self._redessin_prevu = True
+            self.after_idle(self._redessiner)
+
+    def _redessiner(self):
+        self._redessin_prevu = False
+        hauteur_vue = max(self.canvas.winfo_height(), 1)
+        largeur = self.canvas.winfo_width()
+        nb_visibles = hauteur_vue // self.hauteur_ligne + 2
+
+        premier = max(0, int(self.canvas.canvasy(0)) // self.hauteur_ligne)
+        dernier = min(self.total, premier + nb_visibles)
+        if dernier > premier:
+            self._charger_pages(premier, dernier)
+
+        while len(self._pool) < nb_visibles:
+            widget = self.creer_ligne(self.canvas)
+            item = self.canvas.create_window(0, 0, window=widget, anchor="nw", state="hidden")
+            self._pool.append([widget, item, None])
+
+        taille = len(self._pool)
+        utilises = set()
+        for index in range(premier, dernier):
+            ligne = self._ligne(index)
+            if ligne is None:
+                continue
+            slot = self._pool[index % taille]
+            utilises.add(index % taille)
+            widget, item, index_affiche = slot
+            if index_affiche != index:
+                ancienne = None if index_affiche is None else self._ligne(index_affiche)
+                if ancienne is not None:
+                    self._widget_par_id.pop(ancienne[0], None)
+                widget.remplir(ligne)
+                self._widget_par_id[ligne[0]] = widget
+                slot[2] = index
+            self.canvas.coords(item, 0, index * self.hauteur_ligne + self.espacement // 2)
+            self.canvas.itemconfigure(
+                item,
+                width=largeur,
+                height=self.hauteur_ligne - self.espacement,
+                state="normal"
+            )
+
+        for k, (widget, item, _) in enumerate(self._pool):
+            if k not in utilises:
+                self.canvas.itemconfigure(item, state="hidden")
+
+        self._maj_zone_defilement()
+
+    # --- Molette -------------------------------------------------------
+
+    def _activer_molette(self, event=None):
+        self.canvas.bind_all("<MouseWheel>", self._on_molette)
+        self.canvas.bind_all("<Button-4>", self._on_molette)
+        self.canvas.bind_all("<Button-5>", self._on_molette)
+
+    def _desactiver_molette(self, event=None):
+        # Passer du canvas à une ligne déclenche aussi <Leave>
+        if event is not None:
+            survole = self.winfo_containing(event.x_root, event.y_root)
+            if survole is not None and str(survole).startswith(str(self.canvas)):
+                return
+        self.canvas.unbind_all("<MouseWheel>")
+        self.canvas.unbind_all("<Button-4>")
+        self.canvas.unbind_all("<Button-5>")
+
+    def _on_molette(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.canvas.yview_scroll(-1, "units")
+        else:
+            self.canvas.yview_scroll(1, "units")
@@ -3,13 +3,20 @@ Application de consultations citoyennes
 Interface principale - Design épuré fond blanc
 """
 
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from ttkbootstrap.scrolled import ScrolledFrame
 from consultation import creer_formulaire
 from contribution import creer_contribution
-from synthese import afficher_synthese
-from database import init_db, get_consultations, count_contributions, get_consultation_details
+from ecriture_differee import ecrivain
+from liste_virtuelle import ListeVirtuelle
+from surveillance import profilage_demande, surveillance_demandee
+from database import (
+    init_db, get_consultations_page, get_consultation_id_au_rang, get_consultation_resume,
+    count_consultations, rechercher_consultations, rechercher_contributions,
+    DEBUT_SURLIGNAGE, FIN_SURLIGNAGE
+)
 
 # Configuration des styles
 FONT_TITLE = ("Segoe UI", 26, "bold")
@@ -17,6 +24,91 @@ FONT_SUBTITLE = ("Segoe UI", 16, "bold")
 FONT_NORMAL = ("Segoe UI", 11)
 FONT_SMALL = ("Segoe UI", 10)
 
+# Pause de frappe avant de lancer une recherche
+DELAI_RECHERCHE_MS = 250
+
+# Hauteur fixe d'une carte (espacement compris), requise par la liste virtualisée
+HAUTEUR_CARTE = 170
+
+
+class CarteConsultation(ttk.Frame):
+    """Carte d'une consultation, réutilisée pour plusieurs lignes au défilement."""
+    
+    def __init__(self, parent, on_contribuer, on_synthese):
+        # Carte principale avec bordure noire
+        super().__init__(parent, bootstyle="dark", padding=1)
+        self.cid = None
+        self.nom = ""
+        
+        card = ttk.Frame(self, padding=20)
+        card.pack(fill="both", expand=True)
+        
+        # Contenu de la carte
+        content = ttk.Frame(card)
+        content.pack(fill="x")
+        
+        # Colonne gauche : infos
+        info_frame = ttk.Frame(content)
+        info_frame.pack(side="left", fill="both", expand=True)
+        
+        self.nom_label = ttk.Label(
+            info_frame,
+            font=FONT_SUBTITLE,
+            foreground="black",
+            wraplength=600,
+            justify="left"
+        )
+        self.nom_label.pack(anchor="w")
+        
+        # Description tronquée (calculée par la requête)
+        self.desc_label = ttk.Label(
+            info_frame,
+            font=FONT_SMALL,
+            foreground="gray",
+            wraplength=600,
+            justify="left"
+        )
+        self.desc_label.pack(anchor="w", pady=(5, 10))
+        
+        # Badge contributions
+        self.badge_label = ttk.Label(
+            info_frame,
+            font=FONT_SMALL,
+            foreground="black"
+        )
+        self.badge_label.pack(anchor="w")
+        
+        # Colonne droite : boutons
+        btn_frame = ttk.Frame(content)
+        btn_frame.pack(side="right", padx=(20, 0))
+        
+        ttk.Button(
+            btn_frame,
+            text="Contribuer",
+            bootstyle="dark-outline",
+            width=16,
+            command=lambda: on_contribuer(self.cid, self.nom)
+        ).pack(pady=3)
+        
+        ttk.Button(
+            btn_frame,
+            text="Synthèse IA",
+            bootstyle="dark",
+            width=16,
+            command=lambda: on_synthese(self.cid, self.nom)
+        ).pack(pady=3)
+    
+    def remplir(self, ligne):
+        """Affiche une ligne (id, nom, aperçu, nombre de contributions)."""
+        cid, nom, desc_short, nb_contrib = ligne
+        self.cid = cid
+        self.nom = nom
+        self.nom_label.config(text=nom)
+        self.desc_label.config(text=desc_short)
+        self.badge_label.config(
+            text=f"{nb_contrib} contribution{'s' if nb_contrib != 1 else ''}"
+        )
+
 
 class Application:
     def __init__(self):
@@ -28,8 +120,13 @@ class Application:
         self.root.state("zoomed")
         self.root.configure(bg="white")
         
+        # Recherche : anti-rebond ; recherche et chargement de la liste hors du thread Tk
+        self._recherche_after = None
+        self._recherche_seq = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arriere-plan")
+        
         self.setup_ui()
-        self.afficher_consultations()
+        self.charger_consultations()
     
     def setup_ui(self):
         """Configure l'interface principale."""
@@ -69,130 +166,234 @@ class Application:
             text="Consultations actives",
             font=FONT_SUBTITLE,
             foreground="black"
-        ).pack(anchor="w")
+        ).pack(side="left")
+        
+        # Barre de recherche plein texte (à la frappe)
+        search_border = ttk.Frame(subtitle_frame, bootstyle="dark", padding=1)
+        search_border.pack(side="right")
+        
+        self.recherche_var = ttk.StringVar()
+        ttk.Entry(
+            search_border,
+            textvariable=self.recherche_var,
+            font=FONT_NORMAL,
+            width=40,
+            bootstyle="light"
+        ).pack(ipady=4)
+        self.recherche_var.trace_add("write", lambda *_: self.planifier_recherche())
+        
+        ttk.Label(
+            subtitle_frame,
+            text="Rechercher :",
+            font=FONT_NORMAL,
+            foreground="gray"
+        ).pack(side="right", padx=(0, 10))
+        
+        # Résultats de recherche (affichés seulement pendant une recherche)
+        self.resultats_frame = ttk.Frame(main_container, bootstyle="dark", padding=1)
+        
+        self.resultats_text = tk.Text(
+            self.resultats_frame,
+            font=FONT_SMALL,
+            wrap="word",
+            bd=0,
+            padx=15,
+            pady=10,
+            height=14,
+            bg="white",
+            cursor="arrow",
+            state="disabled"
+        )
+        self.resultats_text.pack(fill="x")
+        self.resultats_text.tag_configure("section", font=FONT_NORMAL, foreground="gray")
+        self.resultats_text.tag_configure("titre", font=("Segoe UI", 11, "bold"), foreground="black")
+        self.resultats_text.tag_configure("extrait", foreground="gray")
+        self.resultats_text.tag_configure("surligne", background="#fff3b0", foreground="black")
+        self.resultats_text.tag_configure("lien", underline=True)
         
         # Zone scrollable pour les consultations
         scroll_container = ttk.Frame(main_container)
         scroll_container.pack(fill="both", expand=True, padx=40, pady=10)
+        self.scroll_container = scroll_container
+        
+        # Message si aucune consultation
+        self.empty_frame = ttk.Frame(scroll_container, padding=60)
+        
+        ttk.Label(
+            self.empty_frame,
+            text="Aucune consultation pour le moment",
+            font=FONT_NORMAL,
+            foreground="gray"
+        ).pack()
         
-        self.scroll_frame = ScrolledFrame(scroll_container, autohide=True)
-        self.scroll_frame.pack(fill="both", expand=True)
+        ttk.Label(
+            self.empty_frame,
+            text="Cliquez sur \"+ Nouvelle consultation\" pour commencer",
+            font=FONT_SMALL,
+            foreground="gray"
+        ).pack(pady=10)
         
-        self.liste_container = self.scroll_frame
+        # Liste virtualisée : seules les cartes visibles sont construites
+        self.liste = ListeVirtuelle(
+            scroll_container,
+            hauteur_ligne=HAUTEUR_CARTE,
+            creer_ligne=self.creer_carte_consultation,
+            charger_page=get_consultations_page,
+            compter=count_consultations,
+            id_au_rang=get_consultation_id_au_rang
+        )
+        self.liste.pack(fill="both", expand=True)
     
     def ouvrir_formulaire(self):
         """Ouvre le formulaire de création avec callback de rafraîchissement."""
-        creer_formulaire(self.root, callback=self.afficher_consultations)
+        creer_formulaire(self.root, callback=self.ajouter_consultation)
     
-    def afficher_consultations(self):
-        """Affiche la liste des consultations."""
-        # Nettoyer le container
-        for widget in self.liste_container.winfo_children():
-            widget.destroy()
-        
-        consultations = get_consultations()
-        
-        if not consultations:
-            # Message si aucune consultation
-            empty_frame = ttk.Frame(self.liste_container, padding=60)
-            empty_frame.pack(fill="x")
-            
-            ttk.Label(
-                empty_frame,
-                text="Aucune consultation pour le moment",
-                font=FONT_NORMAL,
-                foreground="gray"
-            ).pack()
-            
-            ttk.Label(
-                empty_frame,
-                text="Cliquez sur \"+ Nouvelle consultation\" pour commencer",
-                font=FONT_SMALL,
-                foreground="gray"
-            ).pack(pady=10)
-            return
-        
-        # Afficher chaque consultation
-        for cid, nom in consultations:
-            self.creer_carte_consultation(cid, nom)
+    def charger_consultations(self):
+        """
+        Lit le nombre de consultations et la première page hors du thread Tk :
+        la fenêtre s'affiche sans attendre la base, la liste se remplit ensuite.
+        """
+        taille_page = self.liste.taille_page
+        future = self._executor.submit(
+            lambda: (count_consultations(), get_consultations_page(0, taille_page))
+        )
+        future.add_done_callback(
+            lambda f: self.root.after(0, self.afficher_consultations, f)
+        )
     
-    def creer_carte_consultation(self, cid, nom):
-        """Crée une carte pour une consultation."""
-        details = get_consultation_details(cid)
-        description = details[1] if details else ""
-        nb_contrib = count_contributions(cid)
-        
-        # Carte principale avec bordure noire
-        card_outer = ttk.Frame(self.liste_container, bootstyle="dark", padding=1)
-        card_outer.pack(fill="x", pady=8)
-        
-        card = ttk.Frame(card_outer, padding=20)
-        card.pack(fill="x")
-        
-        # Contenu de la carte
-        content = ttk.Frame(card)
-        content.pack(fill="x")
+    def afficher_consultations(self, future=None):
+        """Affiche la liste des consultations (préchargée par charger_consultations)."""
+        if future is not None and future.exception() is None:
+            total, premiere_page = future.result()
+            self.liste.recharger(total, premiere_page)
+        else:
+            self.liste.recharger()
         
-        # Colonne gauche : infos
-        info_frame = ttk.Frame(content)
-        info_frame.pack(side="left", fill="both", expand=True)
+        if self.liste.total == 0:
+            self.liste.pack_forget()
+            self.empty_frame.pack(fill="x")
+        else:
+            self.empty_frame.pack_forget()
+            self.liste.pack(fill="both", expand=True)
+    
+    def ajouter_consultation(self, cid):
+        """Ajoute uniquement la carte de la consultation créée."""
+        self.liste.ajouter_ligne(get_consultation_resume(cid))
         
-        ttk.Label(
-            info_frame,
-            text=nom,
-            font=FONT_SUBTITLE,
-            foreground="black",
-            wraplength=600,
-            justify="left"
-        ).pack(anchor="w")
+        if self.liste.total == 1:
+            self.empty_frame.pack_forget()
+            self.liste.pack(fill="both", expand=True)
+    
+    def maj_consultation(self, cid):
+        """Met à jour uniquement la carte d'une consultation (ex. son badge)."""
+        ligne = get_consultation_resume(cid)
+        if ligne:
+            self.liste.maj_ligne(ligne)
+    
+    def creer_carte_consultation(self, parent):
+        """Crée une carte recyclable, remplie ensuite par la liste."""
+        return CarteConsultation(
+            parent,
+            on_contribuer=self.ouvrir_contribution,
+            on_synthese=self.ouvrir_synthese
+        )
+    
+    def ouvrir_synthese(self, cid, nom):
+        """Ouvre la fenêtre de synthèse (requests et synthese importés au premier usage)."""
+        from fenetre_synthese import afficher_synthese
+        afficher_synthese(self.root, cid, nom)
+    
+    def planifier_recherche(self):
+        """Relance la recherche après une courte pause dans la frappe."""
+        if self._recherche_after is not None:
+            self.root.after_cancel(self._recherche_after)
+        self._recherche_after = self.root.after(DELAI_RECHERCHE_MS, self.lancer_recherche)
+    
+    def lancer_recherche(self):
+        """Exécute la recherche hors du thread Tk."""
+        self._recherche_after = None
+        self._recherche_seq += 1
+        seq = self._recherche_seq
+        texte = self.recherche_var.get().strip()
         
-        # Description tronquée
-        desc_short = (description[:120] + "...") if len(description) > 120 else description
-        ttk.Label(
-            info_frame,
-            text=desc_short,
-            font=FONT_SMALL,
-            foreground="gray",
-            wraplength=600,
-            justify="left"
-        ).pack(anchor="w", pady=(5, 10))
+        if len(texte) < 2:
+            self.resultats_frame.pack_forget()
+            return
         
-        # Badge contributions
-        badge_text = f"{nb_contrib} contribution{'s' if nb_contrib != 1 else ''}"
-        ttk.Label(
-            info_frame,
-            text=badge_text,
-            font=FONT_SMALL,
-            foreground="black"
-        ).pack(anchor="w")
+        future = self._executor.submit(
+            lambda: (rechercher_consultations(texte), rechercher_contributions(texte))
+        )
+        future.add_done_callback(
+            lambda f: self.root.after(0, self.afficher_resultats, seq, f)
+        )
+    
+    def afficher_resultats(self, seq, future):
+        """Affiche les résultats, sauf s'ils concernent une saisie dépassée."""
+        if seq != self._recherche_seq:
+            return
         
-        # Colonne droite : boutons
-        btn_frame = ttk.Frame(content)
-        btn_frame.pack(side="right", padx=(20, 0))
+        zone = self.resultats_text
+        zone.config(state="normal")
+        zone.delete("1.0", "end")
         
-        ttk.Button(
-            btn_frame,
-            text="Contribuer",
-            bootstyle="dark-outline",
-            width=16,
-            command=lambda c=cid, n=nom: self.ouvrir_contribution(c, n)
-        ).pack(pady=3)
+        if future.exception() is not None:
+            zone.insert("end", f"Erreur de recherche : {future.exception()}", "extrait")
+        else:
+            consultations, contributions = future.result()
+            if not consultations and not contributions:
+                zone.insert("end", "Aucun résultat", "section")
+            
+            if consultations:
+                zone.insert("end", "Consultations\n", "section")
+            for cid, nom, extrait in consultations:
+                nom_brut = nom.replace(DEBUT_SURLIGNAGE, "").replace(FIN_SURLIGNAGE, "")
+                lien = f"consultation-{cid}"
+                self._inserer_surligne(nom, ("titre", "lien", lien))
+                zone.insert("end", "\n")
+                self._inserer_surligne(extrait, ("extrait",))
+                zone.insert("end", "\n\n")
+                zone.tag_bind(
+                    lien, "<Button-1>",
+                    lambda e, c=cid, n=nom_brut: self.ouvrir_contribution(c, n)
+                )
+            
+            if contributions:
+                zone.insert("end", "Contributions\n", "section")
+            for _, cid, nom, extrait in contributions:
+                zone.insert("end", nom, "titre")
+                zone.insert("end", "\n")
+                self._inserer_surligne(extrait, ("extrait",))
+                zone.insert("end", "\n\n")
         
-        ttk.Button(
-            btn_frame,
-            text="Synthèse IA",
-            bootstyle="dark",
-            width=16,
-            command=lambda c=cid, n=nom: afficher_synthese(self.root, c, n)
-        ).pack(pady=3)
+        zone.config(state="disabled")
+        self.resultats_frame.pack(fill="x", padx=40, pady=(0, 10), before=self.scroll_container)
+    
+    def _inserer_surligne(self, texte, tags):
+        """Insère un extrait en surlignant les passages entre marqueurs."""
+        surligne = False
+        for morceau in texte.replace(FIN_SURLIGNAGE, DEBUT_SURLIGNAGE).split(DEBUT_SURLIGNAGE):
+            if morceau:
+                self.resultats_text.insert(
+                    "end", morceau, tags + (("surligne",) if surligne else ())
+                )
+            surligne = not surligne
     
     def ouvrir_contribution(self, cid, nom):
         """Ouvre le formulaire de contribution avec callback."""
-        creer_contribution(self.root, cid, nom, callback=self.afficher_consultations)
+        creer_contribution(self.root, cid, nom, callback=lambda: self.maj_consultation(cid))
     
     def run(self):
-        """Lance l'application."""
-        self.root.mainloop()
+        """
+        Lance l'application. Selon l'environnement, surveille les gels de la
+        boucle Tk et profile l'exécution (voir surveillance.py).
+        """
+        surveillance = surveillance_demandee(self.root)
+        with profilage_demande():
+            self.root.mainloop()
+        if surveillance:
+            surveillance.arreter()
+        # Aucune contribution en file d'écriture ne doit être perdue
+        ecrivain.arreter()
 
 
 def main():
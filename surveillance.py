@@ -0,0 +1,178 @@
+"""
+Diagnostic des gels de l'interface : surveillance de la latence de la
+boucle Tk et profilage de l'application, tous deux facultatifs.
+
+- CONSULTATION_SURVEILLANCE=1 (ou un seuil en millisecondes) : un battement
+  `after` mesure le retard de la boucle Tk ; au-delà du seuil, un thread
+  de veille capture la pile du thread Tk pendant le gel.
+- CONSULTATION_PROFIL=1 (ou un préfixe de fichiers) : cProfile et
+  tracemalloc pendant l'exécution, rapport écrit à la fermeture.
+
+Les rapports vont sur la sortie d'erreur et, si l'instrumentation est
+active, dans le journal des métriques (voir instrumentation.py).
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+import tkinter as tk
+
+from instrumentation import consigner
+
+VARIABLE_SURVEILLANCE = "CONSULTATION_SURVEILLANCE"
+VARIABLE_PROFIL = "CONSULTATION_PROFIL"
+
+INTERVALLE_MS = 100          # période du battement
+SEUIL_DEFAUT_MS = 250        # retard à partir duquel la boucle est dite gelée
+PREFIXE_PROFIL = "profil"    # profil.prof (pstats) et profil.txt
+NB_FONCTIONS = 40            # lignes du rapport cProfile
+NB_ALLOCATIONS = 25          # lignes du rapport tracemalloc
+NB_CADRES_ALLOCATION = 10    # profondeur des piles mémorisées par tracemalloc
+
+
+def _ecrire(texte):
+    # sys.stderr vaut None sous pythonw
+    if sys.stderr is not None:
+        print(texte, file=sys.stderr, flush=True)
+
+
+def _valeur(variable):
+    valeur = os.environ.get(variable, "").strip()
+    return None if valeur in ("", "0") else valeur
+
+
+class SurveillanceBoucle:
+    """
+    Chien de garde de la boucle Tk. Un rappel `after` toutes les
+    intervalle_ms note l'heure de son passage ; un thread de veille
+    vérifie que le battement revient à temps et, sinon, capture la pile du
+    thread Tk (sys._current_frames) pendant le gel : on voit ainsi ce qui
+    bloque, même si le gel ne se termine jamais. À la reprise, la durée du
+    gel est signalée avec la pile capturée.
+    À créer et démarrer depuis le thread Tk.
+    """
+
+    def __init__(self, root, seuil_ms=SEUIL_DEFAUT_MS, intervalle_ms=INTERVALLE_MS):
+        self.root = root
+        self.seuil = seuil_ms / 1000
+        self.intervalle_ms = intervalle_ms
+        self.intervalle = intervalle_ms / 1000
+        self.ident_tk = threading.get_ident()
+        self.nb_battements = 0
+        self.nb_gels = 0
+        self.retard_max = 0.0
+        self._verrou = threading.Lock()
+        self._battement = time.perf_counter()
+        self._pile = None        # pile capturée pendant le gel en cours
+        self._arret = threading.Event()
+        self._after = None
+        self._thread = None
+
+    def demarrer(self):
+        self._battement = time.perf_counter()
+        self._after = self.root.after(self.intervalle_ms, self._battre)
+        self._thread = threading.Thread(target=self._veiller, daemon=True, name="surveillance-tk")
+        self._thread.start()
+        return self
+
+    def arreter(self):
+        """Arrête la surveillance et résume les retards observés."""
+        self._arret.set()
+        if self._after is not None:
+            try:
+                self.root.after_cancel(self._after)
+            except tk.TclError:
+                pass  # fenêtre déjà détruite
+        _ecrire(f"Surveillance Tk : {self.nb_battements} battements, {self.nb_gels} gel(s), "
+                f"retard maximal {self.retard_max * 1000:.0f} ms")
+
+    # Thread Tk
+
+    def _battre(self):
+        maintenant = time.perf_counter()
+        with self._verrou:
+            retard = maintenant - self._battement - self.intervalle
+            pile, self._pile = self._pile, None
+            self._battement = maintenant
+        self.nb_battements += 1
+        self.retard_max = max(self.retard_max, retard)
+        if retard >= self.seuil:
+            self.nb_gels += 1
+            _ecrire(f"Boucle Tk gelée pendant {retard * 1000:.0f} ms")
+            consigner("gel_tk", duree_ms=round(retard * 1000), pile=pile)
+        if not self._arret.is_set():
+            self._after = self.root.after(self.intervalle_ms, self._battre)
+
+    # Thread de veille
+
+    def _veiller(self):
+        while not self._arret.wait(min(self.seuil, self.intervalle) / 2):
+            with self._verrou:
+                retard = time.perf_counter() - self._battement - self.intervalle
+                if retard < self.seuil or self._pile is not None:
+                    continue
+                import traceback
+
+                cadre = sys._current_frames().get(self.ident_tk)
+                self._pile = "".join(traceback.format_stack(cadre)) if cadre else ""
+                pile = self._pile
+            _ecrire(f"Boucle Tk gelée depuis {retard * 1000:.0f} ms, pile du thread Tk :\n{pile}")
+
+
+def surveillance_demandee(root):
+    """Démarre une SurveillanceBoucle si CONSULTATION_SURVEILLANCE est définie, sinon None."""
+    valeur = _valeur(VARIABLE_SURVEILLANCE)
+    if valeur is None:
+        return None
+    seuil = int(valeur) if valeur.isdigit() and valeur != "1" else SEUIL_DEFAUT_MS
+    return SurveillanceBoucle(root, seuil).demarrer()
+
+
+@contextmanager
+def profilage(prefixe=PREFIXE_PROFIL):
+    """
+    Profile le bloc (cProfile, thread courant uniquement) et suit ses
+    allocations (tracemalloc). À la sortie, écrit prefixe.prof (pour pstats
+    ou snakeviz) et prefixe.txt : fonctions les plus coûteuses en temps
+    cumulé, pic mémoire et lignes allouant le plus.
+    """
+    # Importés ici : inutiles au démarrage quand le profilage n'est pas demandé
+    import cProfile
+    import io
+    import pstats
+    import tracemalloc
+
+    profil = cProfile.Profile()
+    tracemalloc.start(NB_CADRES_ALLOCATION)
+    debut = time.perf_counter()
+    profil.enable()
+    try:
+        yield profil
+    finally:
+        profil.disable()
+        duree = time.perf_counter() - debut
+        instantane = tracemalloc.take_snapshot()
+        courante, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profil.dump_stats(f"{prefixe}.prof")
+        rapport = io.StringIO()
+        rapport.write(f"Durée : {duree:.1f} s\n\n")
+        pstats.Stats(profil, stream=rapport).sort_stats("cumulative").print_stats(NB_FONCTIONS)
+        rapport.write(f"\nMémoire suivie : {courante / 1e6:.1f} Mo à la fin, pic {pic / 1e6:.1f} Mo\n")
+        rapport.write(f"\n{NB_ALLOCATIONS} lignes allouant le plus (encore en mémoire) :\n")
+        for statistique in instantane.statistics("lineno")[:NB_ALLOCATIONS]:
+            rapport.write(f"{statistique}\n")
+        with open(f"{prefixe}.txt", "w", encoding="utf-8") as f:
+            f.write(rapport.getvalue())
+        _ecrire(f"Profil écrit dans {prefixe}.txt et {prefixe}.prof")
+
+
+def profilage_demande():
+    """Contexte de profilage si CONSULTATION_PROFIL est définie, sinon sans effet."""
+    valeur = _valeur(VARIABLE_PROFIL)
+    if valeur is None:
+        return nullcontext()
+    return profilage(PREFIXE_PROFIL if valeur == "1" else valeur)
@@ -1,61 +1,187 @@
 """
 Module de synthèse des contributions avec IA locale (Ollama).
-Design épuré fond blanc avec contours noirs
-Streaming pour affichage en temps réel
+Client, prompts, cache et modes de génération, sans dépendance à Tk
+(la fenêtre est dans fenetre_synthese.py).
+
+Usage en ligne de commande : python -m synthese --all
 """
 
-import tkinter as tk
-from tkinter import messagebox
-import ttkbootstrap as ttk
-from ttkbootstrap.scrolled import ScrolledText
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import socket
+import sys
 import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from database import get_contributions, get_consultation_details
+from database import (
+    TAILLE_PAGE_CONTRIBUTIONS, init_db, get_consultations, get_consultation_details,
+    fermer_connexion, count_contributions, iter_contributions, get_textes_contributions,
+    get_synthese_cache, enregistrer_synthese_cache, purger_syntheses,
+    get_derniere_synthese, enregistrer_derniere_synthese,
+    get_signatures, enregistrer_signatures
+)
+from doublons import signature_minhash, grouper_doublons
+from budget_tokens import (
+    CONTEXTE_INCONNU, CONTEXTE_PLAFOND, EstimateurTokens, budget_contenu, dimensionner_contexte
+)
+from instrumentation import consigner
 
-# Configuration Ollama
-OLLAMA_URL = "http://localhost:11434/api/generate"
+# Configuration Ollama : la variable d'environnement OLLAMA_URL désigne un
+# autre serveur (par exemple faux_ollama.py pour les essais et les mesures)
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434").rstrip("/")
 DEFAULT_MODEL = "qwen2:0.5b"  # Modèle léger et rapide
 
-# Configuration des styles
-FONT_TITLE = ("Segoe UI", 20, "bold")
-FONT_SUBTITLE = ("Segoe UI", 11)
-FONT_NORMAL = ("Segoe UI", 11)
-FONT_SMALL = ("Segoe UI", 10)
+
+class ClientOllama:
+    """
+    Client HTTP partagé vers Ollama : session à connexions persistantes
+    (keep-alive), cache à durée de vie de /api/tags (modèles et état),
+    délais et nouvelles tentatives réglables.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, ttl_tags=30, ttl_echec=5,
+                 timeout_connexion=2, timeout_tags=5, timeout_generation=300,
+                 tentatives=2, taille_pool=4):
+        self.base_url = base_url.rstrip("/")
+        self.taille_pool = taille_pool
+        self.ttl_tags = ttl_tags
+        self.ttl_echec = ttl_echec
+        self.timeout_connexion = timeout_connexion
+        self.timeout_tags = timeout_tags
+        self.timeout_generation = timeout_generation
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=taille_pool,
+            max_retries=Retry(
+                total=tentatives,
+                backoff_factor=0.2,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({"GET"})
+            )
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._verrou = threading.Lock()
+        self._modeles = None     # None : Ollama injoignable
+        self._tags_expire = 0.0
+        self._contextes = {}     # modèle -> longueur de contexte maximale
+        self._echecs_contexte = {}   # modèle -> fin du cache d'un échec de /api/show
+
+    def _tags(self, forcer=False):
+        """Liste des modèles (ou None si Ollama est injoignable), mise en cache."""
+        with self._verrou:
+            if not forcer and time.monotonic() < self._tags_expire:
+                return self._modeles
+            try:
+                response = self.session.get(
+                    f"{self.base_url}/api/tags",
+                    timeout=(self.timeout_connexion, self.timeout_tags)
+                )
+                response.raise_for_status()
+                self._modeles = [model["name"] for model in response.json().get("models", [])]
+                self._tags_expire = time.monotonic() + self.ttl_tags
+            except (requests.exceptions.RequestException, ValueError):
+                self._modeles = None
+                self._tags_expire = time.monotonic() + self.ttl_echec
+            return self._modeles
+
+    def est_disponible(self, forcer=False):
+        return self._tags(forcer) is not None
+
+    def modeles(self, forcer=False):
+        return self._tags(forcer) or []
+
+    def invalider(self):
+        """Oublie l'état mis en cache (prochain appel = nouvelle requête)."""
+        with self._verrou:
+            self._tags_expire = 0.0
+            self._echecs_contexte.clear()
+
+    def contexte_modele(self, model):
+        """
+        Longueur de contexte maximale d'un modèle (/api/show), ou None si
+        inconnue. Un échec (erreur, 404) est lui aussi mis en cache, ttl_echec
+        secondes : chaque lot d'une synthèse hiérarchique n'en refait pas la
+        requête.
+        """
+        with self._verrou:
+            if model in self._contextes:
+                return self._contextes[model]
+            if time.monotonic() < self._echecs_contexte.get(model, 0.0):
+                return None
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/show",
+                json={"model": model},
+                timeout=(self.timeout_connexion, self.timeout_tags)
+            )
+            response.raise_for_status()
+            infos = response.json().get("model_info") or {}
+        except (requests.exceptions.RequestException, ValueError):
+            with self._verrou:
+                self._echecs_contexte[model] = time.monotonic() + self.ttl_echec
+            return None
+        contexte = next(
+            (valeur for cle, valeur in infos.items() if cle.endswith(".context_length")), None
+        )
+        with self._verrou:
+            self._contextes[model] = contexte
+        return contexte
+
+    def generer(self, model, prompt, options, stream=True):
+        """
+        Lance /api/generate et renvoie la réponse HTTP. Le corps n'est lu
+        qu'à la demande, ce qui permet de fermer la réponse pour annuler.
+        """
+        return self.session.post(
+            f"{self.base_url}/api/generate",
+            json={
+                "model": model,
+                "prompt": prompt,
+                "stream": stream,
+                "options": options
+            },
+            stream=True,
+            timeout=(self.timeout_connexion, self.timeout_generation)
+        )
+
+
+# Client partagé par toutes les fenêtres de synthèse
+client = ClientOllama()
+
+# Estimation des tokens, recalée sur les réponses d'Ollama pour chaque modèle
+estimateur = EstimateurTokens()
 
 
 def check_ollama_running():
     """Vérifie si Ollama est en cours d'exécution."""
-    try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=2)
-        return response.status_code == 200
-    except:
-        return False
+    return client.est_disponible()
 
 
 def get_available_models():
     """Récupère la liste des modèles disponibles dans Ollama."""
-    try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return [model["name"] for model in data.get("models", [])]
-    except:
-        pass
-    return []
+    return client.modeles()
 
 
-def generate_synthesis_stream(contributions_text, question, model, text_widget, status_var, btn, win):
-    """
-    Génère une synthèse avec streaming (affichage en temps réel).
-    """
-    prompt = f"""Tu es un expert en analyse et synthèse de contributions citoyennes.
+PROMPT_SYNTHESE = """Tu es un expert en analyse et synthèse de contributions citoyennes.
 
 CONTEXTE:
 Une consultation publique a été organisée sur le thème suivant : "{question}"
 
-CONTRIBUTIONS DES PARTICIPANTS:
-{contributions_text}
+{titre_contenu}:
+{contenu}
 
 MISSION:
 Analyse ces contributions et produis une synthèse structurée qui:
@@ -63,6 +189,8 @@ Analyse ces contributions et produis une synthèse structurée qui:
 2. Présente les POINTS DE CONSENSUS (idées partagées par plusieurs)
 3. Relève les DIVERGENCES ou points de vue opposés
 4. Propose des RECOMMANDATIONS basées sur l'ensemble des avis
+Une contribution marquée « ×N contributions similaires » représente N participants
+ayant exprimé la même idée : tiens-en compte dans le poids que tu lui accordes.
 
 FORMAT DE RÉPONSE:
 Utilise des titres clairs et des puces pour structurer ta réponse.
@@ -70,268 +198,1044 @@ Sois objectif et représente fidèlement toutes les opinions exprimées.
 Écris en français. Sois concis.
 """
 
+PROMPT_LOT = """Tu es un expert en analyse de contributions citoyennes.
+
+Une consultation publique porte sur le thème suivant : "{question}"
+
+Voici un lot de contributions des participants :
+{contenu}
+
+Résume les idées exprimées dans ce lot en quelques puces concises.
+Conserve les propositions concrètes, les points d'accord et de désaccord,
+et indique quand une idée revient dans plusieurs contributions.
+Une contribution marquée « ×N contributions similaires » représente N participants
+ayant exprimé la même idée : tiens-en compte dans le poids que tu lui accordes.
+Écris en français.
+"""
+
+# Paramètres de génération (font partie de la clé de cache ; num_ctx est
+# ajouté à chaque requête selon la taille du prompt)
+OPTIONS_GENERATION = {"temperature": 0.7, "num_predict": 1500}
+OPTIONS_LOT = {"temperature": 0.3, "num_predict": 400}
+VERSION_PROMPT = 2  # à incrémenter à chaque modification des prompts
+
+# Éviction du cache des synthèses
+CACHE_AGE_MAX = 30 * 24 * 3600          # secondes depuis la dernière utilisation
+CACHE_TAILLE_MAX = 20 * 1024 * 1024     # octets de texte au total
+
+PROMPT_MISE_A_JOUR = """Tu es un expert en analyse et synthèse de contributions citoyennes.
+
+CONTEXTE:
+Une consultation publique a été organisée sur le thème suivant : "{question}"
+
+SYNTHÈSE PRÉCÉDENTE (couvre les {nb_anciennes} premières contributions):
+{synthese_precedente}
+
+NOUVELLES CONTRIBUTIONS:
+{contenu}
+
+MISSION:
+Mets à jour la synthèse précédente pour intégrer les nouvelles contributions.
+Conserve sa structure (THÈMES PRINCIPAUX, POINTS DE CONSENSUS, DIVERGENCES,
+RECOMMANDATIONS), ajoute les idées nouvelles et ajuste les points existants
+lorsque les nouvelles contributions les renforcent ou les contredisent.
+Une contribution marquée « ×N contributions similaires » représente N participants
+ayant exprimé la même idée : tiens-en compte dans le poids que tu lui accordes.
+
+FORMAT DE RÉPONSE:
+Renvoie la synthèse complète mise à jour, avec des titres clairs et des puces.
+Sois objectif et représente fidèlement toutes les opinions exprimées.
+Écris en français. Sois concis.
+"""
+
+# Mode hiérarchique (map-reduce) pour les grandes consultations, choisi
+# quand le prompt unique dépasse le budget de contexte du modèle
+BUDGET_LOT_TOKENS = 1200          # taille maximale d'un lot de contributions
+MAX_WORKERS_OLLAMA = 2            # requêtes simultanées vers Ollama
+
+# Mesures provisoires envoyées pendant une génération en streaming
+INTERVALLE_METRIQUES = 0.5        # secondes
+
+
+def estimer_tokens(texte, model=None):
+    """Tokens estimés d'un texte (ou d'une longueur) pour un modèle."""
+    return estimateur.estimer(texte, model)
+
+
+def cout_contribution(longueur, model=None):
+    """Tokens estimés d'une contribution de `longueur` caractères dans un prompt."""
+    return estimer_tokens(longueur, model) + 8  # en-tête et séparateur
+
+
+def contexte_max(model):
+    """Contexte utilisable pour un modèle, dans la limite de CONTEXTE_PLAFOND."""
+    return min(client.contexte_modele(model) or CONTEXTE_INCONNU, CONTEXTE_PLAFOND)
+
+
+def budget_prompt(model, gabarit, options=OPTIONS_GENERATION):
+    """Tokens disponibles pour le contenu d'un prompt dont gabarit est la partie fixe."""
+    return budget_contenu(contexte_max(model), options["num_predict"], estimer_tokens(gabarit, model))
+
+
+def options_contexte(prompt, model, options):
+    """
+    Options de génération avec num_ctx ajusté au prompt.
+    Renvoie (options, tokens estimés du prompt, tient dans le contexte).
+    """
+    tokens = estimer_tokens(prompt, model)
+    num_ctx, tient = dimensionner_contexte(tokens, options["num_predict"], contexte_max(model))
+    return dict(options, num_ctx=num_ctx), tokens, tient
+
+
+def mesurer_prompt(model, prompt, data):
+    """Recale l'estimation sur le prompt_eval_count du dernier message d'Ollama."""
+    estimateur.mesurer(model, len(prompt), data.get("prompt_eval_count"))
+
+
+def mesures_generation(model, prompt, data, duree, premier_token=None):
+    """
+    Mesures d'une génération terminée, d'après le dernier message d'Ollama
+    (eval_count, eval_duration en ns) : tokens produits et débit côté
+    serveur, délai du premier token et durée totale côté client (secondes).
+    """
+    tokens = data.get("eval_count") or 0
+    eval_duration = data.get("eval_duration") or 0
+    return {
+        "modele": model,
+        "caracteres_prompt": len(prompt),
+        "tokens_prompt": data.get("prompt_eval_count"),
+        "tokens": tokens,
+        "tokens_par_s": round(tokens / eval_duration * 1e9, 1) if eval_duration else None,
+        "premier_token_ms": round(premier_token * 1000) if premier_token is not None else None,
+        "duree_s": round(duree, 3),
+        "chargement_ms": round((data.get("load_duration") or 0) / 1e6),
+    }
+
+
+def formater_contributions(contributions, debut=0):
+    """
+    Met en forme les contributions pour un prompt : (id, texte) ou, après
+    dédoublonnage, (id, texte, poids).
+    """
+    blocs = []
+    for i, contribution in enumerate(contributions):
+        en_tete = f"Contribution {debut + i + 1}"
+        poids = contribution[2] if len(contribution) > 2 else 1
+        if poids > 1:
+            en_tete += f" (×{poids} contributions similaires)"
+        blocs.append(f"{en_tete}:\n{contribution[1]}")
+    return "\n\n---\n\n".join(blocs)
+
+
+def signatures_contributions(consultation_id, contribution_ids):
+    """
+    Signatures MinHash (id -> octets) des contributions. Celles absentes de
+    la base sont calculées en relisant les textes par pages, puis stockées.
+    """
+    signatures = get_signatures(consultation_id)
+    manquantes = {cid for cid in contribution_ids if cid not in signatures}
+    if not manquantes:
+        return signatures
+
+    lot = []
+    for cid, texte in iter_contributions(consultation_id, apres_id=min(manquantes) - 1):
+        if cid in manquantes:
+            lot.append((cid, signature_minhash(texte)))
+        if len(lot) >= TAILLE_PAGE_CONTRIBUTIONS:
+            enregistrer_signatures(lot)
+            signatures.update(lot)
+            lot = []
+    if lot:
+        enregistrer_signatures(lot)
+        signatures.update(lot)
+    return signatures
+
+
+def dedoublonner_contributions(contribution_ids, signatures):
+    """
+    Regroupe les quasi-doublons (MinHash/LSH) sans relire les textes.
+    Renvoie des (id, poids) : la plus ancienne contribution de chaque groupe
+    et le nombre de contributions qu'elle représente.
+    """
+    groupes = grouper_doublons([(cid, signatures[cid]) for cid in contribution_ids])
+    return [(groupe[0], len(groupe)) for groupe in groupes]
+
+
+def charger_contributions(selection):
+    """
+    Textes d'une sélection de (id, poids), relus en base au moment de
+    construire un prompt. Renvoie des (id, texte, poids).
+    """
+    textes = get_textes_contributions(cid for cid, _ in selection)
+    return [(cid, textes[cid], poids) for cid, poids in selection if cid in textes]
+
+
+def decouper_contributions(selection, longueurs, model=None, budget_tokens=BUDGET_LOT_TOKENS):
+    """
+    Découpe une sélection de (id, poids) en lots dont le texte tient dans le
+    budget, d'après la longueur de chaque texte (dict id -> caractères).
+    Renvoie une liste de (indice de la première contribution, lot).
+    """
+    lots = []
+    lot, taille, debut = [], 0, 0
+    for i, (cid, poids) in enumerate(selection):
+        cout = cout_contribution(longueurs[cid], model)
+        if lot and taille + cout > budget_tokens:
+            lots.append((debut, lot))
+            lot, taille, debut = [], 0, i
+        lot.append((cid, poids))
+        taille += cout
+    if lot:
+        lots.append((debut, lot))
+    return lots
+
+
+def cle_cache(consultation_id, contributions, model, options=OPTIONS_GENERATION):
+    """
+    Clé de cache d'une synthèse : consultation, empreinte des contributions
+    (ids et textes), modèle, version des prompts et options de génération.
+    """
+    empreinte = hashlib.sha256()
+    for contribution_id, texte in contributions:
+        empreinte.update(f"{contribution_id}\x1f{texte}\x1e".encode("utf-8"))
+    cle = json.dumps({
+        "consultation": consultation_id,
+        "contributions": empreinte.hexdigest(),
+        "modele": model,
+        "version_prompt": VERSION_PROMPT,
+        "options": options,
+    }, sort_keys=True)
+    return hashlib.sha256(cle.encode("utf-8")).hexdigest()
+
+
+def cle_delta(cle):
+    """
+    Clé d'une synthèse obtenue par mise à jour incrémentale des mêmes
+    contributions : distincte de celle d'une synthèse complète, pour qu'une
+    demande complète (--complet, case décochée) ne reçoive pas un delta.
+    """
+    return hashlib.sha256(f"{cle}\x1fdelta".encode("utf-8")).hexdigest()
+
+
+def lire_cache(cle):
+    """Renvoie la synthèse en cache pour cette clé, ou None."""
+    return get_synthese_cache(cle)
+
+
+def ecrire_cache(cle, consultation_id, model, texte):
+    """Écrit une synthèse dans le cache puis applique la politique d'éviction."""
+    enregistrer_synthese_cache(cle, consultation_id, model, texte)
+    purger_syntheses(age_max=CACHE_AGE_MAX, taille_max=CACHE_TAILLE_MAX)
+
+
+class Annulee(Exception):
+    """La génération a été annulée."""
+
+
+def _interrompre(response):
+    """
+    Interrompt depuis un autre thread la lecture en cours d'une réponse :
+    shutdown du socket, sûr entre threads, alors que response.close()
+    attendrait le verrou du tampon tenu par le thread lecteur (jusqu'au
+    prochain octet reçu). Le thread lecteur voit la fin de connexion et
+    ferme lui-même la réponse.
+    """
+    connexion = getattr(response.raw, "connection", None) or getattr(response.raw, "_connection", None)
+    sock = getattr(connexion, "sock", None)
+    if sock is None:
+        return  # réponse déjà lue en entier : connexion rendue au pool
     try:
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": True,
-                "options": {
-                    "temperature": 0.7,
-                    "num_predict": 1500
-                }
-            },
-            stream=True,
-            timeout=300
-        )
-        
-        if response.status_code == 200:
-            # Effacer le texte d'attente
-            def clear_text():
-                text_widget.config(state="normal")
-                text_widget.delete("1.0", "end")
-            win.after(0, clear_text)
-            
-            # Lire le stream
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        import json
-                        data = json.loads(line)
-                        chunk = data.get("response", "")
-                        if chunk:
-                            def append_text(t=chunk):
-                                text_widget.config(state="normal")
-                                text_widget.insert("end", t)
-                                text_widget.see("end")
-                                text_widget.config(state="disabled")
-                            win.after(0, append_text)
-                        
-                        # Vérifier si c'est fini
-                        if data.get("done", False):
-                            break
-                    except:
-                        pass
-            
-            def on_complete():
-                status_var.set("Synthèse terminée")
-                btn.config(state="normal")
-            win.after(0, on_complete)
-            
-        else:
-            def on_error():
-                text_widget.config(state="normal")
-                text_widget.delete("1.0", "end")
-                text_widget.insert("1.0", f"Erreur Ollama: {response.status_code}")
-                text_widget.config(state="disabled")
-                status_var.set("Erreur")
-                btn.config(state="normal")
-            win.after(0, on_error)
-            
-    except requests.exceptions.ConnectionError:
-        def on_error():
-            text_widget.config(state="normal")
-            text_widget.delete("1.0", "end")
-            text_widget.insert("1.0", "Impossible de se connecter à Ollama. Vérifiez qu'il est lancé.")
-            text_widget.config(state="disabled")
-            status_var.set("Erreur de connexion")
-            btn.config(state="normal")
-        win.after(0, on_error)
-    except Exception as e:
-        def on_error():
-            text_widget.config(state="normal")
-            text_widget.delete("1.0", "end")
-            text_widget.insert("1.0", f"Erreur: {str(e)}")
-            text_widget.config(state="disabled")
-            status_var.set("Erreur")
-            btn.config(state="normal")
-        win.after(0, on_error)
-
-
-def afficher_synthese(root, consultation_id, consultation_nom):
-    """Affiche la fenêtre de synthèse pour une consultation."""
-    
-    # Récupérer les contributions
-    contributions = get_contributions(consultation_id)
-    details = get_consultation_details(consultation_id)
-    
-    if not contributions:
-        messagebox.showinfo(
-            "Aucune contribution",
-            "Il n'y a pas encore de contributions pour cette consultation."
-        )
-        return
-    
-    # Créer la fenêtre
-    win = ttk.Toplevel(root)
-    win.title(f"Synthèse - {consultation_nom}")
-    win.geometry("850x650")
-    win.resizable(True, True)
-    win.configure(bg="white")
-    
-    # Centrer la fenêtre
-    win.place_window_center()
-    
-    # Rendre modale
-    win.transient(root)
-    win.grab_set()
-    
-    # Container principal
-    main_frame = ttk.Frame(win, bootstyle="light", padding=25)
-    main_frame.pack(fill="both", expand=True)
-    
-    # Header
-    header_frame = ttk.Frame(main_frame, bootstyle="light")
-    header_frame.pack(fill="x", pady=(0, 15))
-    
-    ttk.Label(
-        header_frame,
-        text="Synthèse IA",
-        font=FONT_TITLE,
-        foreground="black"
-    ).pack(side="left")
-    
-    ttk.Button(
-        header_frame,
-        text="Fermer",
-        bootstyle="secondary-link",
-        command=win.destroy
-    ).pack(side="right")
-    
-    # Info consultation
-    ttk.Label(
-        main_frame,
-        text=consultation_nom,
-        font=FONT_SUBTITLE,
-        foreground="gray",
-        wraplength=750
-    ).pack(anchor="w")
-    
-    nb_contributions = len(contributions)
-    ttk.Label(
-        main_frame,
-        text=f"{nb_contributions} contribution{'s' if nb_contributions > 1 else ''} à analyser",
-        font=FONT_SMALL,
-        foreground="gray"
-    ).pack(anchor="w", pady=(5, 15))
-    
-    # Ligne de séparation
-    sep = ttk.Frame(main_frame, height=1, bootstyle="dark")
-    sep.pack(fill="x", pady=(0, 15))
-    
-    # Sélection du modèle
-    model_frame = ttk.Frame(main_frame, bootstyle="light")
-    model_frame.pack(fill="x", pady=(0, 15))
-    
-    ttk.Label(
-        model_frame,
-        text="Modèle :",
-        font=FONT_NORMAL,
-        foreground="black"
-    ).pack(side="left", padx=(0, 10))
-    
-    models = get_available_models()
-    if not models:
-        models = [DEFAULT_MODEL]
-    
-    model_var = ttk.StringVar(value=models[0] if models else DEFAULT_MODEL)
-    
-    # Combobox avec bordure
-    combo_border = ttk.Frame(model_frame, bootstyle="dark", padding=1)
-    combo_border.pack(side="left")
-    
-    model_combo = ttk.Combobox(
-        combo_border,
-        textvariable=model_var,
-        values=models,
-        state="readonly",
-        width=25,
-        font=FONT_NORMAL
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # socket déjà fermé
+
+
+class JetonAnnulation:
+    """
+    Jeton partagé entre l'interface et le thread de génération. L'annulation
+    coupe immédiatement les connexions des réponses HTTP en cours : Ollama
+    voit la déconnexion et libère son emplacement de génération. annuler()
+    ne bloque pas et peut être appelé depuis le thread Tk.
+    """
+
+    def __init__(self):
+        self._evenement = threading.Event()
+        self._verrou = threading.Lock()
+        self._reponses = set()
+
+    @property
+    def est_annule(self):
+        return self._evenement.is_set()
+
+    def annuler(self):
+        with self._verrou:
+            self._evenement.set()
+            reponses = list(self._reponses)
+        for response in reponses:
+            _interrompre(response)
+
+    def verifier(self):
+        """Lève Annulee si l'annulation a été demandée."""
+        if self._evenement.is_set():
+            raise Annulee()
+
+    def attacher(self, response):
+        with self._verrou:
+            if not self._evenement.is_set():
+                self._reponses.add(response)
+                return
+        response.close()
+        raise Annulee()
+
+    def detacher(self, response):
+        with self._verrou:
+            self._reponses.discard(response)
+
+
+class JobSynthese:
+    """Génération exécutée dans un thread de fond, annulable via son jeton."""
+
+    def __init__(self, cible):
+        self.jeton = JetonAnnulation()
+        self._thread = threading.Thread(target=cible, args=(self.jeton,), daemon=True)
+
+    def demarrer(self):
+        self._thread.start()
+
+    def annuler(self):
+        self.jeton.annuler()
+
+
+class LimiteRequetes:
+    """
+    Nombre maximal de requêtes /api/generate simultanées de tout le
+    processus, quel que soit le nombre de tâches ou de lots qui les
+    émettent. La taille peut changer en cours de route (--workers).
+    """
+
+    def __init__(self, taille):
+        self.taille = taille
+        self._en_cours = 0
+        self._condition = threading.Condition()
+
+    def redimensionner(self, taille):
+        with self._condition:
+            self.taille = taille
+            self._condition.notify_all()
+
+    @contextmanager
+    def emplacement(self, jeton=None):
+        """Attend une place libre ; lève Annulee si le jeton est annulé entre-temps."""
+        with self._condition:
+            while self._en_cours >= self.taille:
+                self._condition.wait(0.1)
+                if jeton:
+                    jeton.verifier()
+            self._en_cours += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._en_cours -= 1
+                self._condition.notify()
+
+
+requetes_ollama = LimiteRequetes(MAX_WORKERS_OLLAMA)
+
+
+def _lire_reponse(response, jeton, lecture):
+    """
+    Lit une réponse HTTP avec lecture(response), en la rattachant au jeton
+    pour que l'annulation interrompe la lecture.
+    """
+    if jeton is None:
+        try:
+            return lecture(response)
+        finally:
+            response.close()
+    jeton.attacher(response)
+    try:
+        return lecture(response)
+    except Exception:
+        # Une lecture interrompue par la fermeture de la réponse = annulation
+        jeton.verifier()
+        raise
+    finally:
+        jeton.detacher(response)
+        response.close()
+
+
+def generer_texte(prompt, model, options=OPTIONS_LOT, jeton=None):
+    """Génère un texte court (requête non streamée), num_ctx ajusté au prompt."""
+    if jeton:
+        jeton.verifier()
+    options, _, _ = options_contexte(prompt, model, options)
+
+    def lecture(r):
+        r.raise_for_status()
+        data = r.json()
+        mesurer_prompt(model, prompt, data)
+        consigner("generation", flux=False,
+                  **mesures_generation(model, prompt, data, time.perf_counter() - debut))
+        return data.get("response", "").strip()
+
+    with requetes_ollama.emplacement(jeton):
+        debut = time.perf_counter()
+        response = client.generer(model, prompt, options, stream=False)
+        return _lire_reponse(response, jeton, lecture)
+
+
+def resumer_lot(lot, debut, question, model, jeton=None):
+    """Résume un lot de contributions."""
+    prompt = PROMPT_LOT.format(
+        question=question,
+        contenu=formater_contributions(lot, debut)
     )
-    model_combo.pack()
-    
-    # Bouton générer
-    btn_generer = ttk.Button(
-        model_frame,
-        text="Générer la synthèse",
-        bootstyle="dark",
-        padding=(20, 8)
+    return generer_texte(prompt, model, OPTIONS_LOT, jeton)
+
+
+def joindre_resumes(resumes):
+    return "\n\n---\n\n".join(
+        f"Lot {k + 1}:\n{resume}" for k, resume in enumerate(resumes)
+    )
+
+
+def fusionner_resumes(resumes, question, model, jeton=None):
+    """Fusionne des résumés partiels en un seul (niveau intermédiaire)."""
+    prompt = PROMPT_SYNTHESE.format(
+        question=question,
+        titre_contenu=f"SYNTHÈSES PARTIELLES ({len(resumes)} lots de contributions)",
+        contenu=joindre_resumes(resumes)
+    )
+    return generer_texte(prompt, model, OPTIONS_LOT, jeton)
+
+
+def reduire_resumes(resumes, question, model, budget, on_statut=None, jeton=None):
+    """
+    Tant que les résumés partiels ne tiennent pas ensemble dans le budget
+    du prompt de fusion, les fusionne par groupes tenant dans ce budget.
+    """
+    while len(resumes) > 1 and estimer_tokens(joindre_resumes(resumes), model) > budget:
+        groupes, groupe, taille = [], [], 0
+        for resume in resumes:
+            cout = estimer_tokens(resume, model) + 8
+            if groupe and taille + cout > budget:
+                groupes.append(groupe)
+                groupe, taille = [], 0
+            groupe.append(resume)
+            taille += cout
+        groupes.append(groupe)
+        if len(groupes) == len(resumes):
+            break  # chaque résumé remplit déjà le budget à lui seul
+
+        if on_statut:
+            on_statut(f"Fusion intermédiaire : {len(resumes)} résumés en {len(groupes)} groupes")
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS_OLLAMA) as executor:
+            resumes = list(executor.map(
+                lambda groupe: fusionner_resumes(groupe, question, model, jeton), groupes
+            ))
+    return resumes
+
+
+class ErreurOllama(Exception):
+    """Réponse HTTP inattendue d'Ollama."""
+
+    def __init__(self, status_code):
+        super().__init__(f"Erreur Ollama: {status_code}")
+        self.status_code = status_code
+
+
+def streamer_prompt(prompt, model, on_morceau=None, jeton=None, on_metriques=None):
+    """
+    Envoie un prompt à Ollama en streaming. Chaque morceau reçu est passé à
+    on_morceau ; renvoie le texte complet. on_metriques reçoit pendant la
+    génération des mesures provisoires (en_cours vrai), toutes les
+    INTERVALLE_METRIQUES secondes, puis celles de mesures_generation. Lève
+    Annulee si le jeton est annulé, ErreurOllama ou les exceptions de
+    requests en cas d'échec.
+    """
+    if jeton:
+        jeton.verifier()
+    options, _, _ = options_contexte(prompt, model, OPTIONS_GENERATION)
+
+    def lecture(response):
+        if response.status_code != 200:
+            raise ErreurOllama(response.status_code)
+
+        morceaux = []
+        premier_token = None
+        prochaines_mesures = debut + INTERVALLE_METRIQUES
+        # Lire le stream jusqu'au bout : la connexion retourne au pool
+        termine = False
+        for line in response.iter_lines():
+            if not line or termine:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue
+            chunk = data.get("response", "")
+            if chunk:
+                maintenant = time.perf_counter()
+                if premier_token is None:
+                    premier_token = maintenant - debut
+                morceaux.append(chunk)
+                if on_morceau:
+                    on_morceau(chunk)
+                if on_metriques and maintenant >= prochaines_mesures:
+                    # Ollama envoie un token par morceau
+                    prochaines_mesures = maintenant + INTERVALLE_METRIQUES
+                    ecoule = maintenant - debut - premier_token
+                    on_metriques({
+                        "en_cours": True,
+                        "tokens": len(morceaux),
+                        "tokens_par_s": round(len(morceaux) / ecoule, 1) if ecoule > 0 else None,
+                        "premier_token_ms": round(premier_token * 1000),
+                    })
+
+            # Vérifier si c'est fini
+            termine = data.get("done", False)
+            if termine:
+                mesurer_prompt(model, prompt, data)
+                mesures = mesures_generation(model, prompt, data,
+                                             time.perf_counter() - debut, premier_token)
+                consigner("generation", flux=True, **mesures)
+                if on_metriques:
+                    on_metriques(mesures)
+
+        if jeton:
+            jeton.verifier()
+        return "".join(morceaux)
+
+    with requetes_ollama.emplacement(jeton):
+        debut = time.perf_counter()
+        try:
+            response = client.generer(model, prompt, options)
+        except requests.exceptions.ConnectionError:
+            client.invalider()
+            raise
+        return _lire_reponse(response, jeton, lecture)
+
+
+def generate_synthesis_stream(contributions_text, question, model, on_morceau=None, jeton=None,
+                              on_metriques=None):
+    """
+    Génère une synthèse avec streaming (affichage en temps réel).
+    """
+    prompt = PROMPT_SYNTHESE.format(
+        question=question,
+        titre_contenu="CONTRIBUTIONS DES PARTICIPANTS",
+        contenu=contributions_text
     )
-    btn_generer.pack(side="right")
-    
-    # Indicateur de statut
-    status_var = ttk.StringVar(value="")
-    status_label = ttk.Label(
-        main_frame,
-        textvariable=status_var,
-        font=FONT_SMALL,
-        foreground="gray"
+    return streamer_prompt(prompt, model, on_morceau, jeton, on_metriques)
+
+
+def generate_synthesis_delta(synthese_precedente, nb_anciennes, nouvelles, question, model,
+                             on_morceau=None, jeton=None, on_metriques=None):
+    """
+    Mise à jour incrémentale : seules la synthèse précédente et les
+    contributions ajoutées depuis sont envoyées au modèle.
+    """
+    prompt = PROMPT_MISE_A_JOUR.format(
+        question=question,
+        nb_anciennes=nb_anciennes,
+        synthese_precedente=synthese_precedente,
+        contenu=formater_contributions(nouvelles, debut=nb_anciennes)
     )
-    status_label.pack(anchor="w", pady=(0, 10))
-    
-    # Zone de résultat avec bordure
-    result_border = ttk.Frame(main_frame, bootstyle="dark", padding=1)
-    result_border.pack(fill="both", expand=True)
-    
-    result_text = ScrolledText(result_border, autohide=True)
-    result_text.pack(fill="both", expand=True)
-    result_text.text.config(
-        font=("Consolas", 10),
-        wrap="word",
-        state="disabled",
-        padx=15,
-        pady=15,
-        bg="white"
+    return streamer_prompt(prompt, model, on_morceau, jeton, on_metriques)
+
+
+def generate_synthesis_hierarchique(lots, question, model, on_morceau=None, on_statut=None,
+                                    jeton=None, budget=None, on_metriques=None):
+    """
+    Synthèse map-reduce : les lots de contributions (liste de (début, lot de
+    (id, poids)) de decouper_contributions) sont résumés en parallèle, puis
+    les résumés partiels sont fusionnés en streaming. Les textes d'un lot ne
+    sont lus qu'au moment de le soumettre, et au plus 2 × MAX_WORKERS_OLLAMA
+    lots sont en mémoire. Si les résumés dépassent ensemble le budget du
+    prompt de fusion, ils sont d'abord fusionnés par groupes. on_statut
+    reçoit l'avancement lot par lot.
+    """
+    nb_lots = len(lots)
+    if on_statut:
+        on_statut(f"Résumé des lots : 0/{nb_lots}")
+
+    resumes = [None] * nb_lots
+    a_soumettre = iter(enumerate(lots))
+    en_cours = {}
+    termines = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS_OLLAMA) as executor:
+        try:
+            while True:
+                places = 2 * MAX_WORKERS_OLLAMA - len(en_cours)
+                for k, (debut, lot) in itertools.islice(a_soumettre, places):
+                    future = executor.submit(
+                        resumer_lot, charger_contributions(lot), debut, question, model, jeton
+                    )
+                    en_cours[future] = k
+                if not en_cours:
+                    break
+                faits, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+                for future in faits:
+                    resumes[en_cours.pop(future)] = future.result()
+                    termines += 1
+                    if on_statut:
+                        on_statut(f"Résumé des lots : {termines}/{nb_lots}")
+        except BaseException:
+            # Ne pas lancer les lots restants (annulation ou erreur)
+            for future in en_cours:
+                future.cancel()
+            raise
+
+    statut = f"Fusion des {nb_lots} résumés partiels... (la réponse s'affiche en temps réel)"
+    if budget is not None:
+        resumes = reduire_resumes(resumes, question, model, budget, on_statut, jeton)
+        if estimer_tokens(joindre_resumes(resumes), model) > budget:
+            statut += " Attention : contexte du modèle dépassé, fusion tronquée."
+    if on_statut:
+        on_statut(statut)
+    prompt = PROMPT_SYNTHESE.format(
+        question=question,
+        titre_contenu=f"SYNTHÈSES PARTIELLES ({nb_lots} lots de contributions)",
+        contenu=joindre_resumes(resumes)
     )
-    
-    # Fonction de génération
-    def lancer_synthese():
-        if not check_ollama_running():
-            messagebox.showerror(
-                "Ollama non disponible",
-                "Ollama n'est pas en cours d'exécution.\n\n"
-                "Pour l'installer :\n"
-                "1. Téléchargez sur https://ollama.ai\n"
-                "2. Installez et lancez Ollama\n"
-                "3. Exécutez : ollama pull mistral\n"
-                "4. Réessayez"
-            )
-            return
-        
-        # Préparer le texte
-        contributions_text = "\n\n---\n\n".join([
-            f"Contribution {i+1}:\n{texte}" 
-            for i, (_, texte) in enumerate(contributions)
-        ])
-        
-        question = details[1] if details else consultation_nom
-        model = model_var.get()
-        
-        # UI loading
-        btn_generer.config(state="disabled")
-        status_var.set("Génération en cours... (la réponse s'affiche en temps réel)")
-        
-        result_text.text.config(state="normal")
-        result_text.text.delete("1.0", "end")
-        result_text.text.insert("1.0", "Connexion au modèle IA...\n")
-        result_text.text.config(state="disabled")
-        
-        # Lancer en streaming
-        thread = threading.Thread(
-            target=generate_synthesis_stream,
-            args=(contributions_text, question, model, result_text.text, status_var, btn_generer, win)
+    return streamer_prompt(prompt, model, on_morceau, jeton, on_metriques)
+
+
+def preparer_synthese(consultation_id, model, incremental=True, verifier_ollama=True, question=""):
+    """
+    Détermine comment produire la synthèse (sans rien générer) :
+    - {"cache": texte} si elle est déjà en cache (une mise à jour
+      incrémentale en cache n'est servie qu'en mode incrémental) ;
+    - {"indisponible": True} si Ollama ne répond pas ;
+    - sinon un plan : nouvelles contributions (mode incrémental) ou
+      représentants dédoublonnés de toutes les contributions, en (id, poids),
+      et lots si le prompt unique dépasse le budget de contexte du modèle ;
+      tokens_prompt, budget_prompt et contexte décrivent la taille du prompt.
+    Les contributions sont lues par pages : seuls les ids et la longueur des
+    textes sont conservés, les textes sont relus à la construction des prompts.
+    """
+    longueurs = {}
+
+    def parcours():
+        for contribution_id, texte in iter_contributions(consultation_id):
+            longueurs[contribution_id] = len(texte)
+            yield contribution_id, texte
+
+    cle = cle_cache(consultation_id, parcours(), model)
+    plan = {"cle": cle, "nb_contributions": len(longueurs)}
+
+    # Synthèse déjà générée pour ces contributions : affichage immédiat
+    texte_cache = lire_cache(cle)
+    if texte_cache is None and incremental:
+        texte_cache = lire_cache(cle_delta(cle))
+    if texte_cache is not None:
+        plan["cache"] = texte_cache
+        return plan
+
+    if verifier_ollama and not check_ollama_running():
+        plan["indisponible"] = True
+        return plan
+
+    ids = list(longueurs)
+    signatures = signatures_contributions(consultation_id, ids)
+
+    # Mode incrémental : ne traiter que les contributions ajoutées depuis
+    # la dernière synthèse de ce modèle
+    dernier_id = ids[-1]
+    precedente = get_derniere_synthese(consultation_id, model) if incremental else None
+    nouvelles = None
+    if precedente and precedente[1] < dernier_id:
+        nouvelles = dedoublonner_contributions(
+            [cid for cid in ids if cid > precedente[1]], signatures
         )
-        thread.daemon = True
-        thread.start()
-    
-    btn_generer.config(command=lancer_synthese)
-    
-    # Note sur la performance
-    perf_label = ttk.Label(
-        main_frame,
-        text="💡 Astuce : Pour une synthèse plus rapide, utilisez un modèle léger comme 'phi3' ou 'llama3.2:1b'",
-        font=FONT_SMALL,
-        foreground="gray"
+        gabarit = PROMPT_MISE_A_JOUR.format(
+            question=question, nb_anciennes=0, synthese_precedente=precedente[0], contenu=""
+        )
+        budget = budget_prompt(model, gabarit)
+        tokens = sum(cout_contribution(longueurs[cid], model) for cid, _ in nouvelles)
+        if tokens > budget:
+            nouvelles = None  # delta trop gros : régénération complète
+
+    # Un seul représentant pondéré par groupe de quasi-doublons ; au-delà du
+    # budget de contexte, synthèse par lots plutôt qu'un prompt tronqué
+    representants = None
+    lots = None
+    if nouvelles:
+        # Cache et fusion des demandes identiques : un delta n'est pas une synthèse complète
+        plan["cle"] = cle_delta(cle)
+    else:
+        representants = dedoublonner_contributions(ids, signatures)
+        gabarit = PROMPT_SYNTHESE.format(
+            question=question, titre_contenu="CONTRIBUTIONS DES PARTICIPANTS", contenu=""
+        )
+        budget = budget_prompt(model, gabarit)
+        tokens = sum(cout_contribution(longueurs[cid], model) for cid, _ in representants)
+        if tokens > budget:
+            lots = decouper_contributions(representants, longueurs, model)
+
+    tokens_gabarit = estimer_tokens(gabarit, model)
+    plan.update({"dernier_id": dernier_id, "precedente": precedente,
+                 "nouvelles": nouvelles, "representants": representants, "lots": lots,
+                 "tokens_prompt": tokens + tokens_gabarit, "budget_prompt": budget + tokens_gabarit,
+                 "contexte": contexte_max(model)})
+    return plan
+
+
+def executer_plan(plan, consultation_id, nb_contributions, question, model,
+                  on_morceau=None, on_statut=None, jeton=None, on_metriques=None):
+    """
+    Génère la synthèse décrite par un plan de preparer_synthese (delta,
+    hiérarchique si le prompt unique déborde, ou complète), puis l'écrit
+    dans le cache et comme dernière synthèse. Renvoie le texte ; lève
+    Annulee si le jeton est annulé (rien n'est alors enregistré).
+    """
+    nouvelles = plan["nouvelles"]
+    if nouvelles:
+        nb_nouvelles = sum(poids for _, poids in nouvelles)
+        texte = generate_synthesis_delta(
+            plan["precedente"][0], nb_contributions - nb_nouvelles,
+            charger_contributions(nouvelles), question, model, on_morceau, jeton, on_metriques
+        )
+    elif plan["lots"]:
+        texte = generate_synthesis_hierarchique(
+            plan["lots"], question, model, on_morceau, on_statut, jeton,
+            budget=budget_prompt(model, PROMPT_SYNTHESE.format(
+                question=question, titre_contenu="SYNTHÈSES PARTIELLES", contenu=""
+            )),
+            on_metriques=on_metriques
+        )
+    else:
+        contributions_text = formater_contributions(charger_contributions(plan["representants"]))
+        texte = generate_synthesis_stream(contributions_text, question, model, on_morceau, jeton,
+                                          on_metriques)
+
+    if texte:
+        ecrire_cache(plan["cle"], consultation_id, model, texte)
+        enregistrer_derniere_synthese(consultation_id, model, texte, plan["dernier_id"])
+    return texte
+
+
+PRIORITE_INTERACTIVE = 0   # fenêtre ouverte par un utilisateur
+PRIORITE_LOT = 10          # synthèses en lot (python -m synthese)
+
+
+class AbonnementSynthese:
+    """
+    Demande d'un client auprès du planificateur. Plusieurs abonnements
+    identiques partagent la même génération ; chacun reçoit tout le flux.
+    """
+
+    def __init__(self, planificateur, tache, on_morceau, on_statut, on_position, on_fin,
+                 on_metriques=None):
+        self._planificateur = planificateur
+        self.tache = tache
+        self.on_morceau = on_morceau
+        self.on_statut = on_statut
+        self.on_position = on_position
+        self.on_fin = on_fin
+        self.on_metriques = on_metriques
+
+    def annuler(self):
+        """Se désabonne ; la génération est annulée s'il n'y a plus d'abonné."""
+        self._planificateur._desabonner(self)
+
+
+class TacheSynthese:
+    """Génération planifiée, identifiée par la clé de cache de sa demande."""
+
+    def __init__(self, cle, cible, priorite, numero):
+        self.cle = cle
+        self.cible = cible
+        self.priorite = priorite
+        self.numero = numero
+        self.job = None
+        self.abonnes = []
+        self.morceaux = []     # flux déjà reçu, rejoué aux abonnés tardifs
+        self.statut = None
+        self.metriques = None
+
+    def __lt__(self, autre):
+        # File à priorités, FIFO à priorité égale
+        return (self.priorite, self.numero) < (autre.priorite, autre.numero)
+
+
+class PlanificateurSyntheses:
+    """
+    Planificateur des générations de tout le processus : au plus `limite`
+    générations simultanées, les autres attendent dans une file à priorités.
+    Une demande identique à une génération en attente ou en cours (même
+    clé : consultation, contributions, modèle) s'y abonne au lieu d'en
+    lancer une seconde. `limite` borne aussi les requêtes envoyées à
+    Ollama (LimiteRequetes `requetes`), y compris les lots résumés en
+    parallèle par une synthèse hiérarchique.
+
+    cible(jeton, on_morceau, on_statut, on_metriques) produit le texte. Les
+    rappels des abonnés sont appelés depuis des threads de fond :
+    on_position(rang) (rang dans la file, 0 au démarrage), on_morceau,
+    on_statut, on_metriques (voir streamer_prompt) et on_fin(texte, erreur).
+    on_morceau est appelé verrou tenu, pour que le flux rejoué à un abonné
+    tardif reste dans l'ordre : il ne doit pas bloquer (les autres rappels
+    sont appelés hors verrou).
+    """
+
+    def __init__(self, limite=MAX_WORKERS_OLLAMA, requetes=None):
+        self.requetes = requetes if requetes is not None else LimiteRequetes(limite)
+        self.limite = limite
+        self._verrou = threading.Lock()
+        self._file = []          # tas de TacheSynthese en attente
+        self._taches = {}        # clé -> tâche en attente ou en cours
+        self._actives = 0
+        self._numeros = itertools.count()
+
+    @property
+    def limite(self):
+        return self.requetes.taille
+
+    @limite.setter
+    def limite(self, valeur):
+        self.requetes.redimensionner(valeur)
+
+    def soumettre(self, cle, cible, on_morceau=None, on_statut=None, on_position=None,
+                  on_fin=None, priorite=PRIORITE_INTERACTIVE, on_metriques=None):
+        appels = []
+        with self._verrou:
+            tache = self._taches.get(cle)
+            if tache is None:
+                tache = TacheSynthese(cle, cible, priorite, next(self._numeros))
+                self._taches[cle] = tache
+                heapq.heappush(self._file, tache)
+            elif tache.job is None and priorite < tache.priorite:
+                # Une demande interactive fait passer devant une tâche de lot identique
+                tache.priorite = priorite
+                heapq.heapify(self._file)
+
+            abonnement = AbonnementSynthese(self, tache, on_morceau, on_statut, on_position, on_fin,
+                                            on_metriques)
+            tache.abonnes.append(abonnement)
+            if tache.job is not None:
+                # Génération déjà en cours : rattraper le flux reçu jusqu'ici
+                if on_position:
+                    appels.append((on_position, 0))
+                if tache.statut and on_statut:
+                    appels.append((on_statut, tache.statut))
+                if tache.metriques and on_metriques:
+                    appels.append((on_metriques, tache.metriques))
+                if tache.morceaux and on_morceau:
+                    on_morceau("".join(tache.morceaux))
+
+            self._lancer(appels)
+            self._signaler_positions(appels)
+        self._notifier(appels)
+        return abonnement
+
+    def executer(self, cle, cible, on_morceau=None, on_statut=None, priorite=PRIORITE_LOT):
+        """Version bloquante de soumettre : renvoie le texte ou lève l'erreur."""
+        fin = threading.Event()
+        resultat = {}
+
+        def on_fin(texte, erreur):
+            resultat["texte"], resultat["erreur"] = texte, erreur
+            fin.set()
+
+        self.soumettre(cle, cible, on_morceau, on_statut, on_fin=on_fin, priorite=priorite)
+        fin.wait()
+        if resultat["erreur"] is not None:
+            raise resultat["erreur"]
+        return resultat["texte"]
+
+    def _notifier(self, appels):
+        for fonction, *args in appels:
+            fonction(*args)
+
+    # Appelées verrou tenu ; les rappels sont différés dans `appels`
+
+    def _lancer(self, appels):
+        while self._file and self._actives < self.limite:
+            tache = heapq.heappop(self._file)
+            self._actives += 1
+            tache.job = JobSynthese(lambda jeton, tache=tache: self._executer_tache(tache, jeton))
+            appels.extend(
+                (abonnement.on_position, 0)
+                for abonnement in tache.abonnes if abonnement.on_position
+            )
+            tache.job.demarrer()
+
+    def _signaler_positions(self, appels):
+        for rang, tache in enumerate(sorted(self._file), start=1):
+            appels.extend(
+                (abonnement.on_position, rang)
+                for abonnement in tache.abonnes if abonnement.on_position
+            )
+
+    def _desabonner(self, abonnement):
+        appels = []
+        with self._verrou:
+            tache = abonnement.tache
+            if abonnement not in tache.abonnes:
+                return
+            tache.abonnes.remove(abonnement)
+            if tache.abonnes:
+                return
+            # Plus personne n'attend ce résultat
+            if self._taches.get(tache.cle) is tache:
+                del self._taches[tache.cle]
+            if tache.job is None:
+                self._file.remove(tache)
+                heapq.heapify(self._file)
+                self._signaler_positions(appels)
+            else:
+                appels.append((tache.job.annuler,))
+        self._notifier(appels)
+
+    # Thread de la tâche
+
+    def _executer_tache(self, tache, jeton):
+        def on_morceau(morceau):
+            with self._verrou:
+                tache.morceaux.append(morceau)
+                for abonnement in tache.abonnes:
+                    if abonnement.on_morceau:
+                        abonnement.on_morceau(morceau)
+
+        def on_statut(texte):
+            with self._verrou:
+                tache.statut = texte
+                appels = [(abonnement.on_statut, texte)
+                          for abonnement in tache.abonnes if abonnement.on_statut]
+            self._notifier(appels)
+
+        def on_metriques(mesures):
+            with self._verrou:
+                tache.metriques = mesures
+                appels = [(abonnement.on_metriques, mesures)
+                          for abonnement in tache.abonnes if abonnement.on_metriques]
+            self._notifier(appels)
+
+        texte, erreur = None, None
+        try:
+            texte = tache.cible(jeton, on_morceau, on_statut, on_metriques)
+        except Exception as e:
+            erreur = e
+        finally:
+            fermer_connexion()
+
+        with self._verrou:
+            if self._taches.get(tache.cle) is tache:
+                del self._taches[tache.cle]
+            self._actives -= 1
+            appels = [(abonnement.on_fin, texte, erreur)
+                      for abonnement in tache.abonnes if abonnement.on_fin]
+            tache.abonnes = []
+            self._lancer(appels)
+            self._signaler_positions(appels)
+        self._notifier(appels)
+
+
+planificateur = PlanificateurSyntheses(requetes=requetes_ollama)
+
+
+def _cible_plan(plan, consultation_id, nb_contributions, question, model):
+    def cible(jeton, on_morceau, on_statut, on_metriques):
+        return executer_plan(plan, consultation_id, nb_contributions, question, model,
+                             on_morceau, on_statut, jeton, on_metriques)
+    return cible
+
+
+def planifier_plan(plan, consultation_id, nb_contributions, question, model,
+                   on_morceau=None, on_statut=None, on_position=None, on_fin=None,
+                   priorite=PRIORITE_INTERACTIVE, on_metriques=None):
+    """
+    Soumet un plan de preparer_synthese au planificateur global. Une demande
+    identique déjà en cours est partagée. Renvoie l'AbonnementSynthese.
+    """
+    cible = _cible_plan(plan, consultation_id, nb_contributions, question, model)
+    return planificateur.soumettre(plan["cle"], cible, on_morceau, on_statut,
+                                   on_position, on_fin, priorite, on_metriques)
+
+
+def synthetiser_consultation(consultation_id, model, incremental=True):
+    """
+    Produit la synthèse d'une consultation sans interface (cache, delta ou
+    génération complète). Renvoie (texte ou None, origine).
+    """
+    if not count_contributions(consultation_id):
+        return None, "vide"
+    details = get_consultation_details(consultation_id)
+    question = details[1] if details else ""
+
+    plan = preparer_synthese(consultation_id, model, incremental, verifier_ollama=False,
+                             question=question)
+    if "cache" in plan:
+        return plan["cache"], "cache"
+    origine = "delta" if plan["nouvelles"] else "complet"
+    texte = planificateur.executer(
+        plan["cle"], _cible_plan(plan, consultation_id, plan["nb_contributions"], question, model)
     )
-    perf_label.pack(anchor="w", pady=(10, 0))
+    return texte, origine
+
+
+def _job_batch(consultation_id, model, incremental):
+    debut = time.perf_counter()
+    try:
+        texte, origine = synthetiser_consultation(consultation_id, model, incremental)
+        erreur = None
+    except Exception as e:
+        texte, origine, erreur = None, "erreur", e
+    finally:
+        fermer_connexion()
+    return consultation_id, origine, time.perf_counter() - debut, texte, erreur
+
+
+def main(argv=None):
+    """Synthèses en lot, sans interface (ex. précalcul nocturne)."""
+    parser = argparse.ArgumentParser(
+        prog="python -m synthese",
+        description="Génère les synthèses de consultations sans interface graphique."
+    )
+    cible = parser.add_mutually_exclusive_group(required=True)
+    cible.add_argument("--all", action="store_true", help="toutes les consultations")
+    cible.add_argument("--consultation", type=int, nargs="+", metavar="ID",
+                       help="consultations à synthétiser")
+    parser.add_argument("--model", default=DEFAULT_MODEL,
+                        help=f"modèle Ollama (défaut : {DEFAULT_MODEL})")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS_OLLAMA,
+                        help=f"générations simultanées (défaut : {MAX_WORKERS_OLLAMA})")
+    parser.add_argument("--complet", action="store_true",
+                        help="ignorer la dernière synthèse (pas de mise à jour incrémentale)")
+    args = parser.parse_args(argv)
+
+    global client
+    init_db()
+    planificateur.limite = args.workers
+    if args.workers > client.taille_pool:
+        # Une connexion persistante par requête simultanée
+        client = ClientOllama(client.base_url, taille_pool=args.workers)
+    if not client.est_disponible(forcer=True):
+        print(f"Ollama injoignable sur {client.base_url}", file=sys.stderr)
+        return 1
+
+    ids = args.consultation or [cid for cid, _ in get_consultations()]
+    debut = time.perf_counter()
+    compteurs = {}
+
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="batch") as executor:
+        futures = [
+            executor.submit(_job_batch, cid, args.model, not args.complet)
+            for cid in ids
+        ]
+        for future in as_completed(futures):
+            cid, origine, duree, texte, erreur = future.result()
+            compteurs[origine] = compteurs.get(origine, 0) + 1
+            detail = f" ({erreur})" if erreur else f" ({len(texte or '')} caractères)"
+            print(f"Consultation {cid:>6} : {origine:<8} {duree:7.2f} s{detail}")
+
+    duree = time.perf_counter() - debut
+    resume = ", ".join(f"{n} {origine}" for origine, n in sorted(compteurs.items()))
+    print(f"{len(ids)} consultation(s) en {duree:.1f} s "
+          f"({len(ids) / duree if duree else 0:.2f} synthèses/s) : {resume}")
+    return 1 if compteurs.get("erreur") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Essais du client Ollama contre le faux serveur : cache de /api/show,
+succès comme échecs.
+"""
+
+import time
+import unittest
+
+from faux_ollama import FauxOllama
+from synthese import ClientOllama
+
+MODELE = "qwen2:0.5b"
+
+
+class TestContexteModele(unittest.TestCase):
+
+    def setUp(self):
+        self.serveur = FauxOllama().demarrer()
+        self.addCleanup(self.serveur.arreter)
+        self.client = ClientOllama(self.serveur.url, ttl_echec=0.2)
+        self.requetes = []
+        post = self.client.session.post
+
+        def compter(url, **kwargs):
+            self.requetes.append(url)
+            return post(url, **kwargs)
+
+        self.client.session.post = compter
+
+    def test_contexte_mis_en_cache(self):
+        self.assertEqual([self.client.contexte_modele(MODELE) for _ in range(3)], [32768] * 3)
+        self.assertEqual(len(self.requetes), 1)
+
+    def test_echec_mis_en_cache_pour_ttl_echec(self):
+        self.assertEqual([self.client.contexte_modele("inconnu") for _ in range(3)], [None] * 3)
+        self.assertEqual(len(self.requetes), 1)
+        time.sleep(0.25)
+        self.assertIsNone(self.client.contexte_modele("inconnu"))
+        self.assertEqual(len(self.requetes), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
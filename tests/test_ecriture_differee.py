@@ -0,0 +1,94 @@
+"""
+Essais de l'écriture différée sur une base temporaire : regroupement des
+opérations par transaction, isolement d'une opération en échec, vidage
+à l'arrêt et synchronisation complète des validations.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import database
+from database import enregistrer_consultation, enregistrer_contribution, get_connexion, init_db
+from ecriture_differee import EcrivainDiffere
+
+TEXTE = "Des pistes cyclables séparées de la circulation autour des écoles, n°"
+
+
+class EcrivainCompte(EcrivainDiffere):
+    """EcrivainDiffere qui note la taille de chaque lot écrit."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lots = []
+
+    def _ecrire_lot(self, operations):
+        self.lots.append(len(operations))
+        super()._ecrire_lot(operations)
+
+
+class TestEcrivainDiffere(unittest.TestCase):
+
+    def setUp(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        nom = database.DB_NAME
+        database.DB_NAME = os.path.join(dossier, "essai.db")
+        self.addCleanup(setattr, database, "DB_NAME", nom)
+        self.addCleanup(database.fermer_connexion)
+        init_db()
+        self.consultation_id = enregistrer_consultation("Mobilité", "Essai")
+        self.ecrivain = EcrivainCompte(fenetre=0.05)
+        self.addCleanup(self.ecrivain.arreter)
+
+    def nb_contributions(self):
+        return get_connexion().execute("SELECT COUNT(*) FROM contributions").fetchone()[0]
+
+    def test_operations_regroupees(self):
+        fins = []
+        for n in range(50):
+            self.ecrivain.soumettre(enregistrer_contribution, self.consultation_id, f"{TEXTE}{n}",
+                                    on_fin=lambda resultat, erreur: fins.append(erreur))
+        self.ecrivain.vider()
+
+        self.assertEqual(fins, [None] * 50)
+        self.assertEqual(self.nb_contributions(), 50)
+        self.assertEqual(sum(self.ecrivain.lots), 50)
+        self.assertLess(len(self.ecrivain.lots), 50)
+
+    def test_operation_en_echec_isolee(self):
+        fins = {}
+
+        def echouer():
+            raise ValueError("échec voulu")
+
+        for n in range(3):
+            self.ecrivain.soumettre(enregistrer_contribution, self.consultation_id, f"{TEXTE}{n}",
+                                    on_fin=lambda resultat, erreur, n=n: fins.__setitem__(n, erreur))
+            if n == 1:
+                self.ecrivain.soumettre(echouer, on_fin=lambda resultat, erreur: fins.__setitem__("echec", erreur))
+        self.ecrivain.vider()
+
+        self.assertIsInstance(fins.pop("echec"), ValueError)
+        self.assertEqual(fins, {0: None, 1: None, 2: None})
+        self.assertEqual(self.nb_contributions(), 3)
+
+    def test_arret_ecrit_les_operations_en_attente(self):
+        for n in range(20):
+            self.ecrivain.soumettre(enregistrer_contribution, self.consultation_id, f"{TEXTE}{n}")
+        self.ecrivain.arreter()
+        self.assertEqual(self.nb_contributions(), 20)
+
+    def test_validation_synchronisee_avant_on_fin(self):
+        fins = []
+        self.ecrivain.soumettre(
+            lambda: get_connexion().execute("PRAGMA synchronous").fetchone()[0],
+            on_fin=lambda resultat, erreur: fins.append(resultat),
+        )
+        self.ecrivain.vider()
+        self.assertEqual(fins, [2])  # FULL
+
+
+if __name__ == "__main__":
+    unittest.main()
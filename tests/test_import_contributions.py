@@ -0,0 +1,76 @@
+"""
+Essais de l'import en masse sur une base temporaire : les lignes
+invalides (octets non UTF-8, texte non textuel) sont rejetées avec leur
+numéro sans interrompre l'import ni perdre le lot en cours.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import database
+from database import enregistrer_consultation, get_connexion, init_db
+from import_contributions import importer_fichier
+
+TEXTE = "Davantage de bancs et d'ombre sur la place du marché"
+
+
+class TestImport(unittest.TestCase):
+
+    def setUp(self):
+        self.dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+        nom = database.DB_NAME
+        database.DB_NAME = os.path.join(self.dossier, "essai.db")
+        self.addCleanup(setattr, database, "DB_NAME", nom)
+        self.addCleanup(database.fermer_connexion)
+        init_db()
+        self.consultation_id = enregistrer_consultation("Place du marché", "Essai")
+
+    def ecrire(self, nom, octets):
+        chemin = os.path.join(self.dossier, nom)
+        with open(chemin, "wb") as f:
+            f.write(octets)
+        return chemin
+
+    def importer(self, chemin):
+        rejets = []
+        rapport = importer_fichier(
+            chemin, self.consultation_id, taille_lot=2,
+            on_rejet=lambda chemin, numero, raison: rejets.append((numero, raison)),
+        )
+        textes = [ligne[0] for ligne in get_connexion().execute("SELECT texte FROM contributions ORDER BY id")]
+        return rapport, rejets, textes
+
+    def test_octets_invalides_csv(self):
+        chemin = self.ecrire("import.csv", (
+            "texte\n"
+            f"{TEXTE} 1\n"
+            f"{TEXTE} 2\n"
+            f"{TEXTE} 3\n"
+        ).encode("utf-8") + b"Caf\xe9 en latin-1 au milieu du fichier\n" + f"{TEXTE} 4\n".encode("utf-8"))
+
+        rapport, rejets, textes = self.importer(chemin)
+
+        self.assertEqual(rejets, [(5, "encodage invalide (UTF-8 attendu)")])
+        self.assertEqual(textes, [f"{TEXTE} {n}" for n in (1, 2, 3, 4)])
+        self.assertEqual((rapport.lues, rapport.importees, rapport.rejetees), (5, 4, 1))
+
+    def test_octets_invalides_et_texte_non_textuel_jsonl(self):
+        chemin = self.ecrire("import.jsonl", (
+            f'{{"texte": "{TEXTE} 1"}}\n'.encode("utf-8")
+            + b'{"texte": "Caf\xe9 en latin-1"}\n'
+            + b'{"texte": 42}\n'
+            + f'{{"texte": "{TEXTE} 2"}}\n'.encode("utf-8")
+        ))
+
+        rapport, rejets, textes = self.importer(chemin)
+
+        self.assertEqual(rejets, [(2, "encodage invalide (UTF-8 attendu)"), (3, "texte invalide")])
+        self.assertEqual(textes, [f"{TEXTE} 1", f"{TEXTE} 2"])
+        self.assertEqual((rapport.lues, rapport.importees, rapport.rejetees), (4, 2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
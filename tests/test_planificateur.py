@@ -0,0 +1,251 @@
+"""
+Essais du planificateur de synthèses contre le faux serveur Ollama :
+fusion des demandes identiques, ordre de la file, limite des requêtes
+simultanées et place libérée par une annulation.
+
+    python -m pytest tests   (ou python -m unittest)
+"""
+
+import threading
+import time
+import unittest
+
+import synthese
+from faux_ollama import FauxOllama
+from synthese import (
+    PRIORITE_INTERACTIVE, PRIORITE_LOT, Annulee, ClientOllama, JetonAnnulation,
+    LimiteRequetes, PlanificateurSyntheses, generer_texte, streamer_prompt
+)
+
+MODELE = "qwen2:0.5b"
+DELAI = 10  # secondes d'attente maximale d'un événement
+
+
+def attendre(condition, delai=DELAI):
+    """Attend que condition() soit vraie ; renvoie sa dernière valeur."""
+    limite = time.perf_counter() + delai
+    while not condition() and time.perf_counter() < limite:
+        time.sleep(0.01)
+    return condition()
+
+
+class SondeActives:
+    """Relève le nombre maximal de générations actives du faux serveur."""
+
+    def __init__(self, serveur):
+        self.serveur = serveur
+        self.pic = 0
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._sonder, daemon=True)
+
+    def _sonder(self):
+        while not self._arret.is_set():
+            self.pic = max(self.pic, self.serveur.compteurs["actives"])
+            time.sleep(0.002)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._arret.set()
+        self._thread.join()
+
+
+class EssaiFauxOllama(unittest.TestCase):
+    """Fait pointer synthese.client vers un faux serveur le temps de l'essai."""
+
+    reglages = {"ttft": 0.05, "tokens_par_seconde": 400, "nb_tokens": 40}
+
+    def setUp(self):
+        self.serveur = FauxOllama(**self.reglages).demarrer()
+        self.addCleanup(self.serveur.arreter)
+        client = synthese.client
+        synthese.client = ClientOllama(self.serveur.url)
+        self.addCleanup(setattr, synthese, "client", client)
+
+
+class TestFusion(EssaiFauxOllama):
+
+    def test_demandes_identiques_une_seule_generation(self):
+        planificateur = PlanificateurSyntheses(limite=2)
+        fins = []
+        morceaux = ([], [])
+
+        def cible(jeton, on_morceau, on_statut, on_metriques):
+            return streamer_prompt("prompt", MODELE, on_morceau, jeton)
+
+        planificateur.soumettre("cle", cible, on_morceau=morceaux[0].append,
+                                on_fin=lambda texte, erreur: fins.append((texte, erreur)))
+        # Le second abonné arrive en cours de flux : le début lui est rejoué
+        self.assertTrue(attendre(lambda: morceaux[0]))
+        planificateur.soumettre("cle", cible, on_morceau=morceaux[1].append,
+                                on_fin=lambda texte, erreur: fins.append((texte, erreur)))
+
+        self.assertTrue(attendre(lambda: len(fins) == 2))
+        texte = fins[0][0]
+        self.assertEqual(fins, [(texte, None), (texte, None)])
+        self.assertEqual("".join(morceaux[0]), texte)
+        self.assertEqual("".join(morceaux[1]), texte)
+        self.assertEqual(self.serveur.compteurs["requetes"], 1)
+
+    def test_cles_differentes_deux_generations(self):
+        planificateur = PlanificateurSyntheses(limite=2)
+        for cle in ("a", "b"):
+            planificateur.executer(
+                cle, lambda jeton, *rappels, cle=cle: streamer_prompt(cle, MODELE, jeton=jeton)
+            )
+        self.assertEqual(self.serveur.compteurs["requetes"], 2)
+
+
+class TestFile(unittest.TestCase):
+
+    def test_priorite_puis_ordre_d_arrivee(self):
+        planificateur = PlanificateurSyntheses(limite=1)
+        liberer = threading.Event()
+        ordre = []
+        fins = []
+        positions = {}
+
+        def cible(nom):
+            def executer(jeton, on_morceau, on_statut, on_metriques):
+                ordre.append(nom)
+                if nom == "occupee":
+                    liberer.wait(DELAI)
+                return nom
+            return executer
+
+        def soumettre(nom, priorite):
+            planificateur.soumettre(
+                nom, cible(nom), priorite=priorite,
+                on_position=lambda rang: positions.__setitem__(nom, rang),
+                on_fin=lambda texte, erreur: fins.append(texte),
+            )
+
+        soumettre("occupee", PRIORITE_LOT)
+        self.assertTrue(attendre(lambda: ordre == ["occupee"]))
+        soumettre("lot 1", PRIORITE_LOT)
+        soumettre("lot 2", PRIORITE_LOT)
+        soumettre("interactive", PRIORITE_INTERACTIVE)
+        self.assertEqual(positions, {"occupee": 0, "interactive": 1, "lot 1": 2, "lot 2": 3})
+
+        liberer.set()
+        self.assertTrue(attendre(lambda: len(fins) == 4))
+        self.assertEqual(ordre, ["occupee", "interactive", "lot 1", "lot 2"])
+
+    def test_demande_interactive_promeut_un_lot_identique(self):
+        planificateur = PlanificateurSyntheses(limite=1)
+        liberer = threading.Event()
+        ordre = []
+
+        def cible(nom):
+            def executer(jeton, on_morceau, on_statut, on_metriques):
+                ordre.append(nom)
+                if nom == "occupee":
+                    liberer.wait(DELAI)
+                return nom
+            return executer
+
+        planificateur.soumettre("occupee", cible("occupee"))
+        self.assertTrue(attendre(lambda: ordre == ["occupee"]))
+        planificateur.soumettre("autre", cible("autre"), priorite=PRIORITE_LOT)
+        planificateur.soumettre("lot", cible("lot"), priorite=PRIORITE_LOT)
+        planificateur.soumettre("lot", cible("lot"), priorite=PRIORITE_INTERACTIVE)
+
+        liberer.set()
+        self.assertTrue(attendre(lambda: len(ordre) == 3))
+        self.assertEqual(ordre, ["occupee", "lot", "autre"])
+
+
+class TestLimite(EssaiFauxOllama):
+
+    def test_taches_simultanees_bornees(self):
+        planificateur = PlanificateurSyntheses(limite=2)
+        fins = []
+        with SondeActives(self.serveur) as sonde:
+            for n in range(5):
+                planificateur.soumettre(
+                    n, lambda jeton, *rappels, n=n: streamer_prompt(f"prompt {n}", MODELE, jeton=jeton),
+                    on_fin=lambda texte, erreur: fins.append(erreur),
+                )
+            self.assertTrue(attendre(lambda: len(fins) == 5))
+        self.assertEqual(fins, [None] * 5)
+        self.assertEqual(sonde.pic, 2)
+
+    def test_requetes_paralleles_d_une_tache_bornees(self):
+        # Une synthèse hiérarchique résume ses lots en parallèle : la limite
+        # porte sur les requêtes, pas seulement sur les tâches
+        taille = synthese.requetes_ollama.taille
+        self.addCleanup(synthese.requetes_ollama.redimensionner, taille)
+        planificateur = PlanificateurSyntheses(requetes=synthese.requetes_ollama)
+
+        def cible(jeton, on_morceau, on_statut, on_metriques):
+            threads = [
+                threading.Thread(target=generer_texte, args=(f"lot {n}", MODELE), kwargs={"jeton": jeton})
+                for n in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return "fin"
+
+        for limite in (1, 3):
+            with self.subTest(limite=limite):
+                planificateur.limite = limite
+                with SondeActives(self.serveur) as sonde:
+                    planificateur.executer(f"cle {limite}", cible)
+                self.assertEqual(sonde.pic, limite)
+
+    def test_attente_d_une_place_annulable(self):
+        limite = LimiteRequetes(1)
+        jeton = JetonAnnulation()
+        erreurs = []
+
+        def attendre_place():
+            try:
+                with limite.emplacement(jeton):
+                    pass
+            except Annulee as e:
+                erreurs.append(e)
+
+        with limite.emplacement():
+            thread = threading.Thread(target=attendre_place)
+            thread.start()
+            jeton.annuler()
+            thread.join(DELAI)
+        self.assertEqual(len(erreurs), 1)
+
+
+class TestAnnulation(EssaiFauxOllama):
+
+    # Génération longue (10 s) pour l'annuler en plein flux
+    reglages = {"ttft": 0.05, "tokens_par_seconde": 20, "nb_tokens": 200}
+
+    def test_annulation_libere_la_place(self):
+        planificateur = PlanificateurSyntheses(limite=1)
+        morceaux = []
+        fins = []
+
+        longue = planificateur.soumettre(
+            "longue", lambda jeton, on_morceau, *rappels: streamer_prompt("long", MODELE, on_morceau, jeton),
+            on_morceau=morceaux.append, on_fin=lambda texte, erreur: fins.append(("longue", erreur)),
+        )
+        planificateur.soumettre(
+            "suivante", lambda *args: "suivante",
+            on_fin=lambda texte, erreur: fins.append((texte, erreur)),
+        )
+        self.assertTrue(attendre(lambda: morceaux))
+
+        debut = time.perf_counter()
+        longue.annuler()
+        self.assertTrue(attendre(lambda: fins, delai=2))
+        self.assertLess(time.perf_counter() - debut, 2)
+        # Le désabonné ne reçoit pas de fin ; la tâche suivante prend la place
+        self.assertEqual(fins, [("suivante", None)])
+        self.assertTrue(attendre(lambda: self.serveur.compteurs["actives"] == 0))
+        self.assertTrue(attendre(lambda: self.serveur.compteurs["abandons"] == 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
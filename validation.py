@@ -0,0 +1,25 @@
+"""
+Règles de validation partagées par les formulaires et les imports
+"""
+
+LONGUEUR_MIN_CONTRIBUTION = 10
+
+
+def erreur_contribution(texte):
+    """
+    Vérifie le texte d'une contribution (déjà nettoyé des espaces).
+    Renvoie (titre, message) si elle est invalide, sinon None.
+    """
+    if not texte:
+        return (
+            "Contribution vide",
+            "Veuillez rédiger votre contribution."
+        )
+
+    if len(texte) < LONGUEUR_MIN_CONTRIBUTION:
+        return (
+            "Contribution trop courte",
+            f"Votre contribution doit contenir au moins {LONGUEUR_MIN_CONTRIBUTION} caractères."
+        )
+
+    return None